@@ -10,6 +10,10 @@ __schema__ = {
         "featured": {
             "label": 30007,
             "action": "featured"
+        },
+        "watchlist": {
+            "label": 30010,
+            "action": "watchlist"
         }
     },
 
@@ -47,6 +51,7 @@ __schema__ = {
 
 home = (
     {"type": "streams", "style": "featured"},
+    {"type": "streams", "style": "watchlist"},
     {"type": "users", "style": "recommended"},
     {"type": "streams"},
     {"type": "categories"},
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from os import listdir, makedirs, remove, replace, stat, utime
+from os.path import join, splitext
+from threading import Lock
+from time import time
+from urllib.parse import urlparse
+
+
+# artwork ----------------------------------------------------------------------
+
+__extensions__ = {".gif", ".jpeg", ".jpg", ".png", ".webp"}
+
+# seconds, live thumbnails change all the time, avatars and category art don't
+__ttls__ = {
+    "live": 300,
+    "art": 604800
+}
+
+
+def artworkPath(directory, url):
+    extension = splitext(urlparse(url).path)[1].lower()
+    if extension not in __extensions__:
+        extension = ".jpg"
+    name = sha1(url.encode("utf-8")).hexdigest()
+    return join(directory, f"{name}{extension}")
+
+
+def __fresh__(path, kind):
+    try:
+        mtime = stat(path).st_mtime
+    except OSError:
+        return None
+    return mtime if (time() - mtime) < __ttls__[kind] else None
+
+
+def localArtwork(directory, url, kind="art"):
+    # the local copy of url if we have a fresh one, None otherwise
+    if (
+        (mtime := __fresh__((path := artworkPath(directory, url)), kind))
+        is not None
+    ):
+        try:
+            # access time is what the cache evicts by
+            utime(path, (time(), mtime))
+        except OSError:
+            pass
+        return path
+    return None
+
+
+def images(data):
+    # (url, kind) of all the images in a response
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, (dict, list)):
+                yield from images(value)
+            elif value and (key in ("avatar", "imgUrl")):
+                yield value, "art"
+            elif value and (key == "thumbnailUrl"):
+                yield value, ("live" if "watchingCount" in data else "art")
+    elif isinstance(data, list):
+        for value in data:
+            yield from images(value)
+
+
+# ------------------------------------------------------------------------------
+# ArtworkCache
+
+class ArtworkCache(object):
+
+    # bytes
+    __max_image_size__ = 2097152
+    __timeout__ = (3.05, 10.0)
+
+    def __init__(self, logger, session, directory, workers=2):
+        self.logger = logger.getLogger("service.artwork")
+        self.__session__ = session
+        self.__directory__ = directory
+        self.__executor__ = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="artwork"
+        )
+        self.__pending__ = set()
+        self.__lock__ = Lock()
+        self.budget = 0
+        self.size = 0
+
+    def __files__(self):
+        for name in listdir(self.__directory__):
+            if not name.endswith(".tmp"):
+                path = join(self.__directory__, name)
+                try:
+                    yield stat(path), path
+                except OSError:
+                    pass
+
+    def start(self):
+        makedirs(self.__directory__, exist_ok=True)
+        self.size = sum(st.st_size for st, path in self.__files__())
+        self.__evict__()
+
+    def stop(self):
+        self.__executor__.shutdown(wait=False, cancel_futures=True)
+
+    def resize(self, budget):
+        # bytes, 0 disables caching (and empties the cache)
+        self.budget = budget
+        self.__evict__()
+
+    # --------------------------------------------------------------------------
+
+    def __evict__(self):
+        # least recently used first, down to 90% of the budget
+        with self.__lock__:
+            if self.size <= self.budget:
+                return
+            files = sorted(self.__files__(), key=lambda x: x[0].st_atime)
+            for st, path in files:
+                if self.size <= (self.budget * 0.9):
+                    break
+                try:
+                    remove(path)
+                except OSError:
+                    pass
+                else:
+                    self.size -= st.st_size
+
+    def __download__(self, url):
+        path = artworkPath(self.__directory__, url)
+        tmp = f"{path}.tmp"
+        try:
+            with self.__session__.get(
+                url, stream=True, timeout=self.__timeout__
+            ) as response:
+                response.raise_for_status()
+                size = 0
+                with open(tmp, "wb") as f:
+                    for chunk in response.iter_content(65536):
+                        size += len(chunk)
+                        if size > self.__max_image_size__:
+                            raise ValueError("image too large")
+                        f.write(chunk)
+            try:
+                size -= stat(path).st_size
+            except OSError:
+                pass
+            replace(tmp, path)
+            with self.__lock__:
+                self.size += size
+            self.__evict__()
+        except Exception as error:
+            self.logger.warning(f"failed to download '{url}' [{error}]")
+            try:
+                remove(tmp)
+            except OSError:
+                pass
+        finally:
+            with self.__lock__:
+                self.__pending__.discard(url)
+
+    def fetch(self, data):
+        if self.budget <= 0:
+            return
+        for url, kind in images(data):
+            if __fresh__(artworkPath(self.__directory__, url), kind) is None:
+                with self.__lock__:
+                    if url in self.__pending__:
+                        continue
+                    self.__pending__.add(url)
+                self.__executor__.submit(self.__download__, url)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from time import monotonic
+
+
+# ------------------------------------------------------------------------------
+# ResponseCache
+
+class ResponseCache(object):
+
+    def __init__(self, maxsize=256):
+        self.__maxsize__ = maxsize
+        self.__entries__ = OrderedDict()
+        self.__lock__ = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def __len__(self):
+        return len(self.__entries__)
+
+    def __contains__(self, key):
+        # doesn't count as a hit nor refresh the entry
+        with self.__lock__:
+            try:
+                return (monotonic() < self.__entries__[key][1])
+            except KeyError:
+                return False
+
+    @staticmethod
+    def key(query, **kwargs):
+        return (
+            query,
+            tuple(
+                sorted(
+                    (key, str(value))
+                    for key, value in kwargs.items() if value is not None
+                )
+            )
+        )
+
+    def lookup(self, key, stale=False):
+        with self.__lock__:
+            try:
+                value, expires = self.__entries__[key]
+            except KeyError:
+                self.misses += 1
+                raise
+            # expired entries are kept around (until evicted) so that they
+            # can still be served while being revalidated
+            if not ((fresh := (monotonic() < expires)) or stale):
+                self.misses += 1
+                raise KeyError(key)
+            self.__entries__.move_to_end(key)
+            self.hits += 1
+            if not fresh:
+                self.stale += 1
+            return value, fresh
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def set(self, key, value, ttl):
+        with self.__lock__:
+            self.__entries__[key] = (value, monotonic() + ttl)
+            self.__entries__.move_to_end(key)
+            while len(self.__entries__) > self.__maxsize__:
+                self.__entries__.popitem(last=False)
+
+    def clear(self):
+        with self.__lock__:
+            self.__entries__.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "size": len(self)
+        }
+
+
+# ------------------------------------------------------------------------------
+# SingleFlight
+
+class SingleFlight(object):
+
+    def __init__(self):
+        self.__flights__ = {}
+        self.__lock__ = Lock()
+        self.coalesced = 0
+
+    def __call__(self, key, func, *args, **kwargs):
+        # concurrent calls with the same key share the first call's result
+        with self.__lock__:
+            if (future := self.__flights__.get(key)) is None:
+                future = self.__flights__[key] = Future()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.__lock__:
+                del self.__flights__[key]
+
+    def stats(self):
+        return {"coalesced": self.coalesced}
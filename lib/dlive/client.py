@@ -4,7 +4,11 @@
 from iapc import Client
 from iapc.tools import Logger, notify
 
-from .objects import Category, Categories, Streams, User, Users
+from .compact import unpack
+from .objects import (
+    Category, Categories, Items, Streams, User, Users, WatchedStreams,
+    WatchedUsers
+)
 
 
 # ------------------------------------------------------------------------------
@@ -33,7 +37,9 @@ class DLiveClient(object):
     def __query__(self, query, list=False, **kwargs):
         data = getattr(self.__client__, query)(**kwargs)
         cls = self.__classes__[query]
-        return cls(data["list"], **data["pageInfo"]) if list else cls(data)
+        if list:
+            return cls(unpack(data["list"]), **data["pageInfo"])
+        return cls(unpack(data) if issubclass(cls, Items) else data)
 
     # --------------------------------------------------------------------------
 
@@ -49,8 +55,9 @@ class DLiveClient(object):
         return (user.livestream if after == "-1" else None, user.pastBroadcasts)
 
     def category(self, **kwargs):
-        streams = self.streams(**kwargs)
-        streams.category = self.__query__("category", **kwargs).title
+        data = self.__client__.category_streams(**kwargs)
+        streams = Streams(unpack(data["list"]), **data["pageInfo"])
+        streams.category = data["category"]
         return streams
 
     # --------------------------------------------------------------------------
@@ -67,9 +74,28 @@ class DLiveClient(object):
     def categories(self, **kwargs):
         return self.__query__("categories", list=True, **kwargs)
 
+    def watchlist(self, **kwargs):
+        data = self.__client__.live_watchlist(**kwargs)
+        return (
+            WatchedStreams(unpack(data["live"])),
+            WatchedUsers(data["offline"])
+        )
+
+    def watch(self, username):
+        return self.__client__.watch(username=username)
+
+    def unwatch(self, username):
+        return self.__client__.unwatch(username=username)
+
     def search(self, **kwargs):
         return self.__query__(kwargs.pop("query"), list=True, **kwargs)
 
+    def suggest(self, prefix, query):
+        return [
+            item["text"]
+            for item in self.__client__.suggest(prefix=prefix, query=query)
+        ]
+
 
 client = DLiveClient()
 
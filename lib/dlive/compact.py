@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+
+from collections.abc import Mapping
+
+
+# compact wire format ----------------------------------------------------------
+
+# lists of items are sent from the service to the plugin as rows, the nested
+# objects they have in common (category, creator, language) are sent once per
+# page in tables and referenced from the rows by key
+
+__tables__ = {
+    "category": "backendID",
+    "creator": "username",
+    "language": "code"
+}
+
+
+def pack(items):
+    keys = {}
+    for item in items:
+        keys.update(dict.fromkeys(item))
+    fields = [key for key in keys if key not in __tables__]
+    nested = [key for key in keys if key in __tables__]
+    tables = {key: {} for key in nested}
+    rows = []
+    for item in items:
+        row = [item.get(field) for field in fields]
+        for key in nested:
+            if (value := item.get(key)) is None:
+                row.append(None)
+            else:
+                table = tables[key]
+                ref = str(value[__tables__[key]])
+                if ref not in table:
+                    table[ref] = value
+                row.append(ref)
+        rows.append(row)
+    return {"fields": fields + nested, "rows": rows, "tables": tables}
+
+
+# ------------------------------------------------------------------------------
+# Row
+
+class Row(Mapping):
+
+    # a packed row read as the item it was packed from: fields are looked up
+    # (and nested objects resolved from the tables) when read, nothing is
+    # rebuilt for the fields that are never read
+
+    __slots__ = ("__fields__", "__values__")
+
+    def __init__(self, fields, values):
+        # fields: {field: (position, table or None)}, shared by the page
+        self.__fields__ = fields
+        self.__values__ = values
+
+    def __getitem__(self, key):
+        position, table = self.__fields__[key]
+        value = self.__values__[position]
+        return value if (table is None) or (value is None) else table[value]
+
+    def __iter__(self):
+        return iter(self.__fields__)
+
+    def __len__(self):
+        return len(self.__fields__)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self)})"
+
+
+def unpack(data):
+    # plain lists are passed through
+    if isinstance(data, list):
+        return data
+    tables = data["tables"]
+    fields = {
+        field: (position, tables.get(field))
+        for position, field in enumerate(data["fields"])
+    }
+    return [Row(fields, row) for row in data["rows"]]
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
 
+from hashlib import sha256
+from re import compile, DOTALL
+
+
 # ------------------------------------------------------------------------------
 # GraphQLError
 
@@ -26,294 +30,512 @@ class GraphQLError(Warning):
         super().__init__(message)
 
 
-# queries ----------------------------------------------------------------------
+# fragments --------------------------------------------------------------------
 
-queries = {
+# only what is read is selected (fields must be kept in sync with what
+# dlive.objects reads, tests/test_selections.py checks both ways)
 
-    "stream": (
-        """
-        query _stream_($username: String!) {
-            user(username: $username) {
+fragments = {
+
+    "CategoryItem": """
+        fragment CategoryItem on Category {
+            backendID
+            title
+            imgUrl
+            watchingCount
+        }
+        """,
+
+    "CategoryRef": """
+        fragment CategoryRef on Category {
+            backendID
+            title
+        }
+        """,
+
+    "UserItem": """
+        fragment UserItem on User {
+            username
+            displayname
+            avatar
+            followers {
+                totalCount
+            }
+        }
+        """,
+
+    "LivestreamItem": """
+        fragment LivestreamItem on Livestream {
+            ageRestriction
+            thumbnailUrl
+            title
+            createdAt
+            watchingCount
+            language {
+                code
+            }
+            category {
+                ...CategoryRef
+            }
+            creator {
                 username
                 displayname
-                livestream {
-                    permlink
-                    ageRestriction
-                    thumbnailUrl
-                    title
-                    createdAt
-                    watchingCount
-                    language {
-                        backendID
-                        code
-                    }
-                    category {
-                        backendID
-                        title
-                        imgUrl
-                        coverImgUrl
-                        watchingCount
-                    }
-                    creator {
-                        username
-                        displayname
-                        avatar
-                    }
-                }
             }
         }
         """,
+
+    "PastBroadcastItem": """
+        fragment PastBroadcastItem on PastBroadcast {
+            ageRestriction
+            length
+            thumbnailUrl
+            title
+            createdAt
+            viewCount
+            playbackUrl
+            #resolution {
+            #    resolution
+            #    url
+            #}
+            language {
+                code
+            }
+            category {
+                ...CategoryRef
+            }
+        }
+        """
+
+}
+
+
+__spread__ = compile(r"\.\.\.\s*(?!on\b)([_A-Za-z]\w*)")
+
+
+def __document__(operation):
+    # append the definitions of all the fragments (recursively) spread in
+    # operation
+    names, pending = [], __spread__.findall(operation)
+    while pending:
+        if (name := pending.pop(0)) not in names:
+            names.append(name)
+            pending.extend(__spread__.findall(fragments[name]))
+    return "".join([operation, *(fragments[name] for name in names)])
+
+
+# queries ----------------------------------------------------------------------
+
+queries = {
+
+    # liveness check before playback, only what the played item needs
+    "live": (
+        __document__(
+            """
+            query _live_($username: String!) {
+                user(username: $username) {
+                    username
+                    displayname
+                    livestream {
+                        ...LivestreamItem
+                    }
+                }
+            }
+            """
+        ),
         ("user",)
     ),
 
     "user": (
-        """
-        query _user_($username: String!, $first: Int, $after: String = "-1") {
-            user(username: $username) {
-                username
-                displayname
-                livestream {
-                    permlink
-                    ageRestriction
-                    thumbnailUrl
-                    title
-                    createdAt
-                    watchingCount
-                    language {
-                        backendID
-                        code
-                    }
-                    category {
-                        backendID
-                        title
-                        imgUrl
-                        coverImgUrl
-                        watchingCount
+        __document__(
+            """
+            query _user_($username: String!, $first: Int, $after: String = "-1") {
+                user(username: $username) {
+                    username
+                    displayname
+                    livestream {
+                        ...LivestreamItem
                     }
-                    creator {
-                        username
-                        displayname
-                        avatar
+                    pastBroadcasts(first: $first, after: $after) {
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
+                        list {
+                            ...PastBroadcastItem
+                        }
                     }
                 }
-                pastBroadcasts(first: $first, after: $after) {
-                    pageInfo {
-                        endCursor
-                        hasNextPage
-                    }
-                    list {
-                        permlink
-                        ageRestriction
-                        length
-                        thumbnailUrl
-                        title
-                        createdAt
-                        viewCount
-                        playbackUrl
-                        #resolution {
-                        #    resolution
-                        #    url
-                        #}
-                        language {
-                            backendID
-                            code
-                        }
-                        category {
-                            backendID
-                            title
-                            imgUrl
-                            coverImgUrl
-                            watchingCount
+            }
+            """
+        ),
+        ("user",)
+    ),
+
+    # later pages of a user's vods, without the livestream
+    "vods": (
+        __document__(
+            """
+            query _vods_($username: String!, $first: Int, $after: String = "-1") {
+                user(username: $username) {
+                    username
+                    displayname
+                    pastBroadcasts(first: $first, after: $after) {
+                        pageInfo {
+                            endCursor
+                            hasNextPage
                         }
-                        creator {
-                            username
-                            displayname
-                            avatar
+                        list {
+                            ...PastBroadcastItem
                         }
                     }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("user",)
     ),
 
     "streams": (
-        """
-        query _streams_($first: Int, $after: String = "-1",
-                        $categoryID: Int = 0, $showNSFW: Boolean = false) {
-            livestreams(input: {first: $first, after: $after,
-                                categoryID: $categoryID, showNSFW: $showNSFW,
-                                order: TRENDING}) {
-                pageInfo {
-                    endCursor
-                    hasNextPage
-                }
-                list {
-                    permlink
-                    ageRestriction
-                    thumbnailUrl
-                    title
-                    createdAt
-                    watchingCount
-                    language {
-                        backendID
-                        code
-                    }
-                    category {
-                        backendID
-                        title
-                        imgUrl
-                        coverImgUrl
-                        watchingCount
+        __document__(
+            """
+            query _streams_($first: Int, $after: String = "-1",
+                            $categoryID: Int = 0, $showNSFW: Boolean = false) {
+                livestreams(input: {first: $first, after: $after,
+                                    categoryID: $categoryID, showNSFW: $showNSFW,
+                                    order: TRENDING}) {
+                    pageInfo {
+                        endCursor
+                        hasNextPage
                     }
-                    creator {
-                        username
-                        displayname
-                        avatar
+                    list {
+                        ...LivestreamItem
                     }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("livestreams",)
     ),
 
     "featured": (
-        """
-        query _featured_($userLanguageCode: String) {
-            carousels(count: 8, userLanguageCode: $userLanguageCode) {
-                item {
-                    ... on Livestream {
-                        permlink
-                        ageRestriction
-                        thumbnailUrl
-                        title
-                        createdAt
-                        watchingCount
-                        language {
-                            backendID
-                            code
-                        }
-                        category {
-                            backendID
-                            title
-                            imgUrl
-                            coverImgUrl
-                            watchingCount
-                        }
-                        creator {
-                            username
-                            displayname
-                            avatar
+        __document__(
+            """
+            query _featured_($userLanguageCode: String) {
+                carousels(count: 8, userLanguageCode: $userLanguageCode) {
+                    item {
+                        ... on Livestream {
+                            ...LivestreamItem
                         }
                     }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("carousels",)
     ),
 
     "recommended": (
-        """
-        query _recommended_ {
-            globalInfo {
-                recommendChannels(limit: 8) {
-                    user {
-                        username
-                        displayname
-                        avatar
-                        followers {
-                            totalCount
+        __document__(
+            """
+            query _recommended_ {
+                globalInfo {
+                    recommendChannels(limit: 8) {
+                        user {
+                            ...UserItem
                         }
                     }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("globalInfo", "recommendChannels")
     ),
 
     "categories": (
-        """
-        query _categories_($first: Int, $after: String = "-1") {
-            categories(input: {first: $first, after: $after}) {
-                pageInfo {
-                    endCursor
-                    hasNextPage
-                }
-                list {
-                    backendID
-                    title
-                    imgUrl
-                    coverImgUrl
-                    watchingCount
+        __document__(
+            """
+            query _categories_($first: Int, $after: String = "-1") {
+                categories(input: {first: $first, after: $after}) {
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                    list {
+                        ...CategoryItem
+                    }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("categories",)
     ),
 
     "search_users": (
-        """
-        query _search_users_($text: String!, $first: Int, $after: String = "-1") {
-            search(text: $text) {
-                allUsers(first: $first, after: $after) {
-                    pageInfo {
-                        endCursor
-                        hasNextPage
-                    }
-                    list {
-                        ... on Livestream {
-                            creator {
-                                username
-                                displayname
-                                avatar
-                                followers {
-                                    totalCount
+        __document__(
+            """
+            query _search_users_($text: String!, $first: Int, $after: String = "-1") {
+                search(text: $text) {
+                    allUsers(first: $first, after: $after) {
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
+                        list {
+                            ... on Livestream {
+                                creator {
+                                    ...UserItem
                                 }
                             }
-                        }
-                        ... on User {
-                            username
-                            displayname
-                            avatar
-                            followers {
-                                totalCount
+                            ... on User {
+                                ...UserItem
                             }
                         }
                     }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("search", "allUsers")
     ),
 
     "search_categories": (
-        """
-        query _search_categories_($text: String!, $first: Int, $after: String = "-1") {
-            search(text: $text) {
-                liveCategories(first: $first, after: $after) {
-                    pageInfo {
-                        endCursor
-                        hasNextPage
-                    }
-                    list {
-                        backendID
-                        title
-                        imgUrl
-                        coverImgUrl
-                        watchingCount
+        __document__(
+            """
+            query _search_categories_($text: String!, $first: Int, $after: String = "-1") {
+                search(text: $text) {
+                    liveCategories(first: $first, after: $after) {
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
+                        list {
+                            ...CategoryItem
+                        }
                     }
                 }
             }
-        }
-        """,
+            """
+        ),
         ("search", "liveCategories")
     ),
 
 }
 
+
+# ------------------------------------------------------------------------------
+# Query
+
+__comment__ = compile(r"#[^\n]*")
+__punctuator__ = compile(r"\s*(\.\.\.|[!$(),:=@\[\]{|}])\s*")
+__space__ = compile(r"\s+")
+
+
+def minify(document):
+    # our documents don't hold string values with significant whitespace
+    return __punctuator__.sub(
+        r"\1", __space__.sub(" ", __comment__.sub("", document))
+    ).strip()
+
+
+def digest(document):
+    return sha256(document.encode("utf-8")).hexdigest()
+
+
+class Query(object):
+
+    def __init__(self, document, keys):
+        self.document = minify(document)
+        self.sha256 = digest(self.document)
+        self.keys = keys
+
+
+# compiled once, at import
+queries = {name: Query(*query) for name, query in queries.items()}
+
+
+# persisted queries (APQ) ------------------------------------------------------
+
+def persistedQuery(sha256):
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+
+
+def persistedQueryNotFound(response):
+    for error in (response.get("errors", None) or []):
+        if isinstance(error, dict) and (
+            (error.get("message", None) == "PersistedQueryNotFound") or
+            (
+                (error.get("extensions", None) or {}).get("code", None) ==
+                "PERSISTED_QUERY_NOT_FOUND"
+            )
+        ):
+            return True
+    return False
+
+
+class PersistedQueries(object):
+
+    # hash alone first, the document is only sent if the server doesn't know
+    # the hash (and registers it then).
+    # any other error-only answer to a hash alone means the server doesn't
+    # do APQ (PersistedQueryNotSupported, "must provide query", ...), the
+    # document is sent right away and APQ isn't tried again
+
+    def __init__(self):
+        self.enabled = False
+        self.supported = True
+
+    def request(self, post, document, sha256, variables=None):
+        json = {}
+        if variables:
+            json.update(variables=variables)
+        if self.enabled and self.supported:
+            extensions = persistedQuery(sha256)
+            response = post(dict(json, extensions=extensions))
+            if (response.get("data", None) is not None) or (
+                not response.get("errors", None)
+            ):
+                return response
+            if persistedQueryNotFound(response):
+                json.update(extensions=extensions)
+            else:
+                self.supported = False
+        return post(dict(json, query=document))
+
+
+# ------------------------------------------------------------------------------
+# Batch
+
+__variable__ = compile(r"\$(\w+)")
+__operation__ = compile(
+    r"^\s*query\s+\w+\s*(?:\((?P<variables>[^)]*)\))?\s*"
+    r"\{(?P<selection>.*)\}\s*$",
+    DOTALL
+)
+
+
+def __roots__(selection):
+    # top-level fields of a selection set, as (position, name)
+    depth, expect, i, end = 0, True, 0, len(selection)
+    while i < end:
+        c = selection[i]
+        if c in "{(":
+            depth += 1
+        elif c in "})":
+            depth -= 1
+            expect = (depth == 0) and (c == "}")
+        elif (depth == 0) and expect and (c.isalpha() or c == "_"):
+            j = i
+            while (j < end) and (selection[j].isalnum() or selection[j] == "_"):
+                j += 1
+            yield i, selection[i:j]
+            rest = selection[j:].lstrip()
+            expect = not rest.startswith(("(", "{"))
+            i = j
+            continue
+        i += 1
+
+
+def __definitions__(document):
+    # top-level definitions of a document (operations and fragments)
+    depth, start = 0, 0
+    for i, c in enumerate(document):
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            if (depth := depth - 1) == 0:
+                yield document[start:i + 1].strip()
+                start = i + 1
+
+
+class Batch(object):
+
+    def __init__(self):
+        self.__parts__ = []
+        self.__variables__ = []
+        self.__selections__ = []
+        self.__aliases__ = {}
+        self.__fragments__ = {}
+
+    def __len__(self):
+        return len(self.__parts__)
+
+    def add(self, query, **kwargs):
+        index = len(self.__parts__)
+        operation = None
+        # fragments are shared by all parts (and can't use variables)
+        for definition in __definitions__(queries[query].document):
+            if definition.startswith("fragment"):
+                self.__fragments__[definition.split()[1]] = definition
+            else:
+                operation = definition
+        match = __operation__.match(operation)
+        prefix = f"_{index}_"
+        variables, selection = (
+            __variable__.sub(rf"${prefix}\1", match.group(group) or "")
+            for group in ("variables", "selection")
+        )
+        roots = {}
+        for position, name in reversed(list(__roots__(selection))):
+            roots[name] = alias = f"{prefix}{name}"
+            self.__aliases__[alias] = index
+            selection = f"{selection[:position]}{alias}: {selection[position:]}"
+        if (variables := variables.strip()):
+            self.__variables__.append(variables)
+        self.__selections__.append(selection.strip())
+        self.__parts__.append(
+            (roots, {f"{prefix}{k}": v for k, v in kwargs.items()})
+        )
+        return index
+
+    @property
+    def document(self):
+        variables = ", ".join(self.__variables__)
+        selections = " ".join(self.__selections__)
+        return minify(
+            " ".join(
+                [
+                    (
+                        f"query _batch_{f'({variables})' if variables else ''} "
+                        f"{{{selections}}}"
+                    ),
+                    *self.__fragments__.values()
+                ]
+            )
+        )
+
+    @property
+    def sha256(self):
+        return digest(self.document)
+
+    @property
+    def variables(self):
+        return {
+            k: v for roots, kwargs in self.__parts__ for k, v in kwargs.items()
+        }
+
+    def split(self, response):
+        # returns a (data, errors) tuple per part, errors are routed to their
+        # part through their path, errors without a path go to all parts
+        data = response.get("data", None)
+        errors = [[] for _ in self.__parts__]
+        for error in (response.get("errors", None) or []):
+            try:
+                index = self.__aliases__[error["path"][0]]
+            except (TypeError, KeyError, IndexError):
+                for part in errors:
+                    part.append(error)
+            else:
+                errors[index].append(error)
+        results = []
+        for (roots, kwargs), part_errors in zip(self.__parts__, errors):
+            part_data = None
+            if data is not None:
+                part_data = {
+                    name: data.get(alias) for name, alias in roots.items()
+                }
+                if part_errors and all(
+                    value is None for value in part_data.values()
+                ):
+                    part_data = None
+            results.append((part_data, part_errors or None))
+        return results
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from threading import Lock
+
+
+# index ------------------------------------------------------------------------
+
+def normalize(text):
+    return " ".join(text.split()).casefold()
+
+
+def distinct(texts, exclude=()):
+    # texts that still differ once normalized (first seen kept, in order),
+    # and from the excluded ones
+    seen = {normalize(text) for text in exclude}
+    for text in texts:
+        if (key := normalize(text)) not in seen:
+            seen.add(key)
+            yield text
+
+
+def terms(data):
+    # (query, text) of all the users and categories in a response
+    if isinstance(data, dict):
+        if (username := data.get("username")):
+            yield "search_users", username
+            if (displayname := data.get("displayname")):
+                yield "search_users", displayname
+        elif ("backendID" in data) and (title := data.get("title")):
+            yield "search_categories", title
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                yield from terms(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from terms(value)
+
+
+# ------------------------------------------------------------------------------
+# PrefixIndex
+
+class PrefixIndex(object):
+
+    # a sorted array of (normalized text, query, text), prefix lookups are a
+    # bisect followed by a short scan.
+    # oldest entries are dropped first once maxsize is reached
+
+    def __init__(self, maxsize=16384):
+        self.__maxsize__ = maxsize
+        self.__keys__ = []
+        self.__entries__ = OrderedDict()
+        self.__lock__ = Lock()
+
+    def __len__(self):
+        return len(self.__keys__)
+
+    def __remove__(self, key):
+        del self.__keys__[bisect_left(self.__keys__, key)]
+
+    def add(self, query, text):
+        key = (normalize(text), query, text)
+        with self.__lock__:
+            if key in self.__entries__:
+                self.__entries__.move_to_end(key)
+                return
+            self.__entries__[key] = None
+            insort(self.__keys__, key)
+            while len(self.__entries__) > self.__maxsize__:
+                self.__remove__(self.__entries__.popitem(last=False)[0])
+
+    def feed(self, data):
+        for query, text in terms(data):
+            self.add(query, text)
+
+    def suggest(self, prefix, query=None, limit=10):
+        prefix = normalize(prefix)
+        suggestions = []
+        with self.__lock__:
+            keys = self.__keys__
+            for index in range(bisect_left(keys, (prefix,)), len(keys)):
+                normalized, _query_, text = keys[index]
+                if (
+                    (not normalized.startswith(prefix)) or
+                    (len(suggestions) >= limit)
+                ):
+                    break
+                if (query is None) or (_query_ == query):
+                    suggestions.append({"query": _query_, "text": text})
+        return suggestions
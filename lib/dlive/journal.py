@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+
+from json import dump, dumps, load, loads
+from os import (
+    O_APPEND, O_CREAT, O_WRONLY, SEEK_CUR,
+    close, fdopen, fstat, getpid, listdir, lseek, makedirs, open as osOpen,
+    remove, replace, stat, write
+)
+from os.path import join, split
+from tempfile import mkstemp
+from threading import Lock, Thread
+
+try:
+    from os import O_BINARY
+except ImportError:
+    O_BINARY = 0
+
+
+# ------------------------------------------------------------------------------
+# Journal
+
+# a snapshot ({path}.json) plus append-only logs ({path}.{generation}.log) of
+# the entries recorded since, one json line per entry.
+# compacting starts a new generation and writes the snapshot in the
+# background. the snapshot records how far into each log it goes, so a log
+# is only replayed past that point (entries another process appended while
+# the snapshot was being written are not lost) and only removed when fully
+# covered.
+# other processes (script.py) record into the same journal, read() returns
+# what they appended since, or None when a full load() is needed (another
+# process compacted).
+
+def __fingerprint__(st):
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class Journal(object):
+
+    def __init__(self, path, threshold=256):
+        self.__directory__, self.__name__ = split(path)
+        self.__snapshot__ = f"{path}.json"
+        self.__threshold__ = threshold
+        self.__lock__ = Lock()
+        self.__identity__ = None
+        self.__generation__ = 0
+        self.__offsets__ = {}
+        self.__entries__ = 0
+        self.__compacting__ = None
+
+    def __log__(self, generation):
+        return join(self.__directory__, f"{self.__name__}.{generation}.log")
+
+    def __logs__(self):
+        prefix, suffix = f"{self.__name__}.", ".log"
+        for name in listdir(self.__directory__):
+            if name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    yield int(name[len(prefix):-len(suffix)])
+                except ValueError:
+                    pass
+
+    def __size__(self, generation):
+        try:
+            return stat(self.__log__(generation)).st_size
+        except FileNotFoundError:
+            return None
+
+    def __read__(self, generation, offset):
+        # complete lines only, a line being written is read next time
+        try:
+            with open(self.__log__(generation), "rb") as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], offset
+        end = chunk.rfind(b"\n") + 1
+        entries = []
+        for line in chunk[:end].splitlines():
+            try:
+                entries.append(loads(line))
+            except ValueError:
+                # torn write
+                pass
+        return entries, offset + end
+
+    @property
+    def full(self):
+        return (self.__entries__ >= self.__threshold__)
+
+    def load(self):
+        # returns the snapshot's data (None if there is none yet) and the
+        # entries recorded since, in order
+        makedirs(self.__directory__, exist_ok=True)
+        try:
+            with open(self.__snapshot__, "r") as f:
+                identity = __fingerprint__(fstat(f.fileno()))
+                snapshot = load(f)
+        except (OSError, ValueError):
+            identity, snapshot = None, {}
+        base = snapshot.get("generation", 0)
+        covered = {
+            int(log): offset
+            for log, offset in snapshot.get("offsets", {}).items()
+        }
+        entries, offsets = [], {}
+        for log in sorted(self.__logs__()):
+            offset = covered.get(log, 0) if log < base else 0
+            if (self.__size__(log) or 0) < offset:
+                # removed after the snapshot and written to again since
+                offset = 0
+            logged, offsets[log] = self.__read__(log, offset)
+            entries.extend(logged)
+        with self.__lock__:
+            self.__identity__ = identity
+            self.__generation__ = max(base, *offsets) if offsets else base
+            self.__offsets__ = offsets
+            self.__entries__ = len(entries)
+        return snapshot.get("data", None), entries
+
+    def read(self):
+        with self.__lock__:
+            try:
+                identity = __fingerprint__(stat(self.__snapshot__))
+            except FileNotFoundError:
+                identity = None
+            if identity != self.__identity__:
+                return None
+            entries = []
+            logs = set(self.__logs__())
+            for log in sorted(logs):
+                offset = self.__offsets__.get(log, 0)
+                if (size := self.__size__(log)) is None:
+                    continue
+                if size < offset:
+                    return None
+                if size > offset:
+                    logged, self.__offsets__[log] = self.__read__(log, offset)
+                    entries.extend(logged)
+                self.__generation__ = max(self.__generation__, log)
+            for log in (set(self.__offsets__) - logs):
+                del self.__offsets__[log]
+            self.__entries__ += len(entries)
+            return entries
+
+    def append(self, entry):
+        # returns None (nothing written) if another process compacted since
+        # our last read, False if it appended, the caller then has to reload
+        # to get the entries in order
+        line = f"{dumps(entry)}\n".encode("utf-8")
+        with self.__lock__:
+            try:
+                identity = __fingerprint__(stat(self.__snapshot__))
+            except FileNotFoundError:
+                identity = None
+            if identity != self.__identity__:
+                return None
+            generation = self.__generation__
+            fd = osOpen(
+                self.__log__(generation),
+                O_WRONLY | O_APPEND | O_CREAT | O_BINARY,
+                0o644
+            )
+            try:
+                write(fd, line)
+                end = lseek(fd, 0, SEEK_CUR)
+            finally:
+                close(fd)
+            self.__entries__ += 1
+            if (end - len(line)) != self.__offsets__.get(generation, 0):
+                return False
+            self.__offsets__[generation] = end
+            return True
+
+    def compact(self, data):
+        # data must be the state as of the last read or appended entry, and
+        # must not be mutated afterwards (it is serialized in the background)
+        with self.__lock__:
+            if self.__compacting__ is None:
+                self.__generation__ += 1
+                self.__entries__ = 0
+                self.__compacting__ = Thread(
+                    target=self.__compact__,
+                    args=(
+                        data, self.__generation__, dict(self.__offsets__)
+                    ),
+                    name=f"compact-{self.__name__}"
+                )
+                self.__compacting__.start()
+            return self.__compacting__
+
+    def __compact__(self, data, generation, offsets):
+        tmp = None
+        try:
+            # one per writer, the plugin and script.py may compact at the
+            # same time
+            fd, tmp = mkstemp(
+                suffix=".tmp",
+                prefix=f"{self.__name__}.{getpid()}.{generation}.",
+                dir=self.__directory__
+            )
+            with fdopen(fd, "w") as f:
+                dump(
+                    {
+                        "generation": generation,
+                        "offsets": offsets,
+                        "data": data
+                    },
+                    f
+                )
+            replace(tmp, self.__snapshot__)
+            with self.__lock__:
+                self.__identity__ = __fingerprint__(stat(self.__snapshot__))
+            for log, offset in offsets.items():
+                if self.__size__(log) == offset:
+                    remove(self.__log__(log))
+                    with self.__lock__:
+                        self.__offsets__.pop(log, None)
+        except OSError:
+            # the logs are still there, next load or compaction will do
+            if tmp:
+                try:
+                    remove(tmp)
+                except OSError:
+                    pass
+        finally:
+            with self.__lock__:
+                self.__compacting__ = None
+
+
+# ------------------------------------------------------------------------------
+# Journaled
+
+class Journaled(object):
+
+    # Persistent class the data was kept in before, if any
+    __legacy__ = None
+
+    def __init__(self, path):
+        self.__journal__ = Journal(path)
+        self.__lock__ = Lock()
+        self.__state__ = None
+
+    def __migrate__(self):
+        # seed the journal with what the legacy class saved, once
+        data = self.__dump__(self.__legacy__())
+        self.__journal__.compact(data).join()
+        return data
+
+    def __load__(self):
+        data, entries = self.__journal__.load()
+        if (data is None) and (not entries) and self.__legacy__:
+            data = self.__migrate__()
+        self.__state__ = self.__restore__(data)
+        return entries
+
+    def __sync__(self):
+        # loaded on first use, then kept up to date with what other
+        # processes (script.py) record in the same journal
+        if (
+            (self.__state__ is None) or
+            ((entries := self.__journal__.read()) is None)
+        ):
+            entries = self.__load__()
+        for entry in entries:
+            try:
+                self.__apply__(self.__state__, *entry)
+            except LookupError:
+                pass
+        if self.__journal__.full:
+            self.__journal__.compact(self.__dump__(self.__state__))
+        return self.__state__
+
+    @property
+    def state(self):
+        with self.__lock__:
+            return self.__sync__()
+
+    def __record__(self, *entry):
+        with self.__lock__:
+            while True:
+                state = self.__sync__()
+                # only entries that could be applied are recorded
+                result = self.__apply__(state, *entry)
+                if (appended := self.__journal__.append(entry)) is not None:
+                    break
+                # another process compacted in between, start over
+                self.__state__ = None
+            if not appended:
+                # another process recorded in between, replay in order
+                self.__state__ = None
+            elif self.__journal__.full:
+                self.__journal__.compact(self.__dump__(state))
+            return result
@@ -1,34 +1,36 @@
 # -*- coding: utf-8 -*-
 
 
-from datetime import datetime
-
 from iapc.tools import (
     localizedString, maybeLocalize, getAddonId, ListItem, buildUrl
 )
 from iapc.tools.objects import Type, Object, List
 
 from . import __schema__
+from .compact import unpack
+from .records import Record, __date__, rawFormat
+from .utils import artwork
 
 
 # ------------------------------------------------------------------------------
 # Item
 
-def __date__(value):
-    if isinstance(value, str):
-        return datetime.fromtimestamp(int(value) / 1000)
-    return value
-
-
 class ItemType(Type):
 
     __transform__ = {"__date__": __date__}
 
 
-class Item(Object, metaclass=ItemType):
+class Base(object):
+
+    __slots__ = ()
 
     __menus__ = []
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if (plot := cls.__dict__.get("__plot__")):
+            cls.__raw_plot__ = rawFormat(plot)
+
     @classmethod
     def menus(cls, **kwargs):
         return [
@@ -41,7 +43,16 @@ class Item(Object, metaclass=ItemType):
 
     @property
     def plot(self):
-        return self.__plot__.format(self)
+        try:
+            return self.__raw_plot__.format(self)
+        except (KeyError, TypeError):
+            # a nested object is missing
+            return self.__plot__.format(self)
+
+
+class Item(Base, Object, metaclass=ItemType):
+
+    pass
 
 
 # ------------------------------------------------------------------------------
@@ -102,7 +113,7 @@ class Category(Item):
 
     @property
     def thumbnail(self):
-        return self.imgUrl or "DefaultGenre.png"
+        return artwork(self.imgUrl) or "DefaultGenre.png"
 
     def getItem(self, url, action):
         return ListItem(
@@ -127,6 +138,10 @@ class User(Item):
 
     __plot__ = localizedString(30054)
 
+    __menus__ = [
+        (30032, "RunScript({addonId},watchUser,{username})")
+    ]
+
     @property
     def livestream(self):
         return Livestream(self["livestream"])
@@ -135,7 +150,7 @@ class User(Item):
     def pastBroadcasts(self):
         vods = self.get("pastBroadcasts", {})
         return PastBroadcasts(
-            vods.get("list", []),
+            unpack(vods.get("list", [])),
             category=self.displayname,
             **vods.get("pageInfo", {})
         )
@@ -146,10 +161,10 @@ class User(Item):
 
     @property
     def thumbnail(self):
-        return self.avatar or "DefaultArtist.png"
+        return artwork(self.avatar) or "DefaultArtist.png"
 
     def getItem(self, url, action):
-        return ListItem(
+        item = ListItem(
             self.displayname,
             buildUrl(url, action=action, username=self.username),
             isFolder=True,
@@ -157,6 +172,8 @@ class User(Item):
             poster=self.thumbnail,
             thumb=self.thumbnail
         )
+        item.addContextMenuItems(self.menus(username=self.username))
+        return item
 
 
 class Users(Items):
@@ -167,11 +184,12 @@ class Users(Items):
 # ------------------------------------------------------------------------------
 # Video
 
-class Video(Item):
+class VideoBase(Base):
+
+    __slots__ = ()
 
-    __transform__ = {"language": Object, "category": Category, "creator": User}
-    __date__ = {"createdAt"}
     __infos__ = {"mediatype": "video"}
+    __artwork__ = "art"
 
     @property
     def rating(self):
@@ -183,7 +201,10 @@ class Video(Item):
 
     @property
     def thumbnail(self):
-        return self.thumbnailUrl or "DefaultAddonVideo.png"
+        return (
+            artwork(self.thumbnailUrl, self.__artwork__) or
+            "DefaultAddonVideo.png"
+        )
 
     def makeItem(self, path):
         return ListItem(
@@ -194,12 +215,29 @@ class Video(Item):
         )
 
 
+class Video(VideoBase, Item):
+
+    __transform__ = {"language": Object, "category": Category, "creator": User}
+    __date__ = {"createdAt"}
+
+
+class VideoRecord(VideoBase, Record):
+
+    __slots__ = ()
+
+    __transform__ = Video.__transform__
+    __date__ = Video.__date__
+
+
 # ------------------------------------------------------------------------------
 # Livestream
 
-class Livestream(Video):
+class LivestreamBase(VideoBase):
+
+    __slots__ = ()
 
     __plot__ = localizedString(30055)
+    __artwork__ = "live"
 
     @property
     def infos(self):
@@ -212,35 +250,90 @@ class Livestream(Video):
 
     def getItem(self, url, action):
         return self.makeItem(
-            buildUrl(url, action=action, username=self.creator.username)
+            buildUrl(url, action=action, username=self["creator"]["username"])
         )
 
 
+class Livestream(LivestreamBase, Video):
+
+    pass
+
+
 # ------------------------------------------------------------------------------
 # Streams
 
-class Stream(Livestream):
+class StreamRecord(LivestreamBase, VideoRecord):
+
+    __slots__ = ()
 
     __menus__ = [
-        (30031, "RunScript({addonId},goToUser,{username})")
+        (30031, "RunScript({addonId},goToUser,{username})"),
+        (30032, "RunScript({addonId},watchUser,{username})")
     ]
 
     def makeItem(self, path):
         item = super().makeItem(path)
-        item.setLabel(f"{self.creator.displayname} - {self.title}")
-        item.addContextMenuItems(self.menus(username=self.creator.username))
+        creator = self["creator"]
+        item.setLabel(f"{creator['displayname']} - {self.title}")
+        item.addContextMenuItems(self.menus(username=creator["username"]))
         return item
 
 
 class Streams(Items):
 
-    __ctor__ = Stream
+    __ctor__ = StreamRecord
+
+
+class WatchedStreamRecord(StreamRecord):
+
+    __slots__ = ()
+
+    __menus__ = [
+        (30031, "RunScript({addonId},goToUser,{username})"),
+        (30033, "RunScript({addonId},unwatchUser,{username})")
+    ]
+
+
+class WatchedStreams(Items):
+
+    __ctor__ = WatchedStreamRecord
+
+
+class WatchedUser(Item):
+
+    # a watched user that isn't live, or wasn't found
+
+    __menus__ = [
+        (30031, "RunScript({addonId},goToUser,{username})"),
+        (30033, "RunScript({addonId},unwatchUser,{username})")
+    ]
+
+    def getItem(self, url, action):
+        status = localizedString(30016 if self.found else 30017)
+        label = f"[COLOR gray]{self.username} ({status})[/COLOR]"
+        menus = self.menus(username=self.username)
+        return ListItem(
+            label,
+            buildUrl(url, action=action, username=self.username),
+            isFolder=True,
+            infos={"video": {"title": self.username, "plot": status}},
+            contextMenus=menus if self.found else menus[1:],
+            poster="DefaultArtist.png",
+            thumb="DefaultArtist.png"
+        )
+
+
+class WatchedUsers(Items):
+
+    __ctor__ = WatchedUser
 
 
 # ------------------------------------------------------------------------------
 # PastBroadcasts
 
-class PastBroadcast(Video):
+class PastBroadcastRecord(VideoRecord):
+
+    __slots__ = ()
 
     __plot__ = localizedString(30056)
 
@@ -255,7 +348,7 @@ class PastBroadcast(Video):
 
 class PastBroadcasts(Items):
 
-    __ctor__ = PastBroadcast
+    __ctor__ = PastBroadcastRecord
 
 
 # ------------------------------------------------------------------------------
@@ -2,29 +2,44 @@
 
 
 from collections import deque, OrderedDict
+from functools import partial
+from itertools import chain, islice
 
-from iapc.tools import Persistent, save, notify
+from iapc.tools import Persistent, getSetting, notify
 
+from .client import client
+from .index import distinct
+from .journal import Journaled
 from .objects import Queries
-from .utils import searchDialog
+from .utils import getProfilePath, searchDialog
 
 
 # ------------------------------------------------------------------------------
 # SearchCache
 
-class SearchCache(Persistent, deque):
+class SearchCache(Journaled):
+
+    def __init__(self):
+        super().__init__(getProfilePath("search_cache"))
+
+    def __restore__(self, data):
+        return deque(data or [])
+
+    def __dump__(self, state):
+        return list(state)
+
+    def __apply__(self, state, action, *args):
+        return getattr(state, action)(*args)
 
-    @save
     def clear(self):
-        super().clear()
+        if self.state:
+            self.__record__("clear")
 
-    @save
     def push(self, item):
-        super().append(item)
+        self.__record__("append", item)
 
-    @save
     def pop(self):
-        return super().pop()
+        return self.__record__("pop")
 
 
 search_cache = SearchCache()
@@ -33,36 +48,105 @@ search_cache = SearchCache()
 # ------------------------------------------------------------------------------
 # SearchHistory
 
+# the Persistent search history, only read to migrate it to the journal (the
+# class keeps its name so that what Persistent saved can still be loaded)
 class SearchHistory(Persistent, dict):
 
     def __missing__(self, key):
         self[key] = OrderedDict()
         return self[key]
 
-    @save
+
+class JournaledSearchHistory(Journaled):
+
+    __legacy__ = SearchHistory
+
+    # completions are looked up for that many recent searches
+    __completed__ = 5
+
+    def __init__(self):
+        super().__init__(getProfilePath("search_history"))
+
+    def __restore__(self, data):
+        return {
+            query: OrderedDict(texts) for query, texts in (data or {}).items()
+        }
+
+    def __dump__(self, state):
+        return {query: dict(texts) for query, texts in state.items()}
+
+    @staticmethod
+    def __size__(query):
+        return getSetting(f"{query}_history", int)
+
+    def __apply__(self, state, action, query, *args):
+        if action == "new":
+            text, kwargs, size = args
+            texts = state.setdefault(query, OrderedDict())
+            texts[text] = kwargs
+            texts.move_to_end(text)
+            # least recently used first
+            while len(texts) > size:
+                texts.popitem(last=False)
+        elif action == "promote":
+            state[query].move_to_end(args[0])
+        elif action == "remove":
+            del state[query][args[0]]
+        elif action == "clear":
+            if query:
+                state.pop(query, None)
+            else:
+                state.clear()
+
     def new(self, **kwargs):
-        if (text := searchDialog()):
+        suggest = partial(client.suggest, query=(query := kwargs["query"]))
+        if (text := searchDialog(suggest)):
             kwargs["text"] = text
-            self[kwargs["query"]][text] = kwargs
+            self.__record__("new", query, text, kwargs, self.__size__(query))
         return kwargs
 
-    @save
+    def promote(self, **kwargs):
+        # move a reused search to the front of the history
+        if (
+            (texts := self.state.get(kwargs["query"])) and
+            ((text := kwargs["text"]) in texts) and
+            (next(reversed(texts)) != text)
+        ):
+            self.__record__("promote", kwargs["query"], text)
+
     def remove(self, **kwargs):
-        del self[kwargs["query"]][kwargs["text"]]
+        self.__record__("remove", kwargs["query"], kwargs["text"])
 
-    @save
     def clear(self, **kwargs):
         if (query := kwargs.get("query")):
-            self[query].clear()
+            self.__record__("clear", query)
         else:
-            super().clear()
+            self.__record__("clear", None)
             notify(30114, time=2000)
 
     def history(self, category=None, **kwargs):
+        texts = self.state.get((query := kwargs["query"]), OrderedDict())
         return Queries(
-            reversed(self[kwargs["query"]].values()), category=category
+            islice(reversed(texts.values()), self.__size__(query)),
+            category=category
         )
 
+    def completions(self, limit=10, **kwargs):
+        # what the service knows that completes the recent searches, the
+        # searches in the history (and their variants) left out
+        texts = list(self.state.get((query := kwargs["query"]), OrderedDict()))
+        return list(
+            islice(
+                distinct(
+                    chain.from_iterable(
+                        client.suggest(text, query)
+                        for text in islice(reversed(texts), self.__completed__)
+                    ),
+                    texts
+                ),
+                limit
+            )
+        )
 
-search_history = SearchHistory()
 
+search_history = JournaledSearchHistory()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+
+from datetime import datetime
+from re import compile
+
+
+# ------------------------------------------------------------------------------
+# dates
+
+def __date__(value):
+    if isinstance(value, str):
+        return datetime.fromtimestamp(int(value) / 1000)
+    return value
+
+
+# ------------------------------------------------------------------------------
+# raw formats
+
+__nested__ = compile(r"\{0\.(\w+(?:\.\w+)+)\}")
+
+
+def __subscript__(match):
+    keys = match.group(1).split(".")
+    return "{0" + "".join(f"[{key}]" for key in keys) + "}"
+
+
+def rawFormat(string):
+    # "{0.creator.displayname}" -> "{0[creator][displayname]}", nested fields
+    # are then read from the raw data, no objects are built for them
+    return __nested__.sub(__subscript__, string)
+
+
+# ------------------------------------------------------------------------------
+# Record
+
+class Record(object):
+
+    # a lightweight, read-only, alternative to Item for long lists: the raw
+    # data is kept as is, nested objects and dates are only converted when
+    # read as attributes (record["creator"] is the raw dict)
+
+    __slots__ = ("__data__",)
+
+    __transform__ = {}
+    __date__ = set()
+
+    def __init__(self, data):
+        self.__data__ = data
+
+    def __getitem__(self, key):
+        return self.__data__[key]
+
+    def __getattr__(self, name):
+        # dunder lookups (copy, pickle, __data__ not set yet) are not data
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        try:
+            value = self.__data__[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        if (ctor := self.__transform__.get(name)):
+            return ctor(value)
+        if name in self.__date__:
+            return __date__(value)
+        return value
@@ -1,10 +1,42 @@
 # -*- coding: utf-8 -*-
 
 
+from os.path import join
+
+from xbmcaddon import Addon
+from xbmcgui import Dialog
+from xbmcvfs import translatePath
+
 from iapc.tools import (
-    localizedString, ListItem, buildUrl, getMedia, executeBuiltin, inputDialog
+    localizedString, ListItem, buildUrl, getMedia, executeBuiltin, inputDialog,
+    getSetting
 )
 
+from .artwork import localArtwork
+from .index import distinct
+
+
+# profile ----------------------------------------------------------------------
+
+def getProfilePath(*args):
+    return join(translatePath(Addon().getAddonInfo("profile")), *args)
+
+
+# artwork ----------------------------------------------------------------------
+
+__artwork_dir__ = getProfilePath("artwork")
+
+
+def artwork(url, kind="art"):
+    # the local copy of url if caching is on (the setting is read here, the
+    # service may not have evicted yet) and we have a fresh one, url otherwise
+    if (
+        url and (getSetting("artwork", int) > 0) and
+        (path := localArtwork(__artwork_dir__, url, kind))
+    ):
+        return path
+    return url
+
 
 # misc useful items ------------------------------------------------------------
 
@@ -41,10 +73,33 @@ def newSearchItem(url, **kwargs):
     return __makeItem__(30098, url, "DefaultAddSource.png", **kwargs)
 
 
+# completion item
+def completionItem(url, text, **kwargs):
+    return ListItem(
+        f"[I]{text}[/I]",
+        buildUrl(url, text=text, **kwargs),
+        isFolder=True,
+        infos={"video": {"title": text, "plot": localizedString(30097)}},
+        poster="DefaultAddonsSearch.png",
+        thumb="DefaultAddonsSearch.png"
+    )
+
+
 # search -----------------------------------------------------------------------
 
-def searchDialog():
-    return inputDialog(heading=30002)
+def searchDialog(suggest=None):
+    # suggest(text) returns completions of text known locally, if any they
+    # are offered before searching (the typed text comes first), variants
+    # of the typed text (case, spacing) are not
+    if (
+        (text := inputDialog(heading=30002)) and
+        suggest and
+        (suggestions := list(distinct(suggest(text), (text,))))
+    ):
+        texts = [text] + suggestions
+        index = Dialog().select(localizedString(30002), texts)
+        return texts[index] if index >= 0 else None
+    return text
 
 
 # ------------------------------------------------------------------------------
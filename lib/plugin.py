@@ -3,13 +3,19 @@
 
 from sys import argv
 
-from iapc.tools import Plugin, action, parseQuery, openSettings, getSetting
+from xbmcplugin import addDirectoryItems, setContent, setPluginCategory
+
+from iapc.tools import (
+    Plugin, action, parseQuery, openSettings, getSetting, maybeLocalize
+)
 
 from dlive import home, styles, search_queries
 from dlive.client import client
 from dlive.objects import Folders
 from dlive.persistence import search_cache, search_history
-from dlive.utils import settingsItem, moreItem, newSearchItem
+from dlive.utils import (
+    settingsItem, moreItem, newSearchItem, completionItem
+)
 
 
 # ------------------------------------------------------------------------------
@@ -25,26 +31,31 @@ class DLivePlugin(Plugin):
             for style in styles[type]
         )
 
-    def addNewSearch(self, **kwargs):
-        return self.addItem(
-            newSearchItem(self.url, action="search", new=True, **kwargs)
-        )
-
-    def addSettings(self):
-        if getSetting("settings", bool):
-            return self.addItem(settingsItem(self.url, action="settings"))
+    def getNewSearchItem(self, **kwargs):
+        return newSearchItem(self.url, action="search", new=True, **kwargs)
+
+    def getSettingsItem(self):
+        return settingsItem(self.url, action="settings")
+
+    def addDirectory(self, items, *args, headers=(), footers=(), **kwargs):
+        # all items, headers and "more" included, are added in one call, the
+        # list's content and category are applied as Plugin.addDirectory does
+        listitems = [
+            *headers, *(item.getItem(self.url, *args) for item in items)
+        ]
+        if items.hasNextPage:
+            kwargs["after"] = items.endCursor
+            listitems.append(moreItem(self.url, action=self.action, **kwargs))
+        listitems.extend(footers)
+        listitems = [listitem.asItem() for listitem in listitems]
+        if not addDirectoryItems(self.handle, listitems, len(listitems)):
+            return False
+        if (content := getattr(items, "content", None)):
+            setContent(self.handle, content)
+        if (category := getattr(items, "category", None)):
+            setPluginCategory(self.handle, maybeLocalize(category))
         return True
 
-    def addDirectory(self, items, *args, **kwargs):
-        if super().addDirectory(items, *args):
-            if items.hasNextPage:
-                kwargs["after"] = items.endCursor
-                return self.addItem(
-                    moreItem(self.url, action=self.action, **kwargs)
-                )
-            return True
-        return False
-
     # stream -------------------------------------------------------------------
 
     @action()
@@ -58,9 +69,11 @@ class DLivePlugin(Plugin):
     @action()
     def user(self, **kwargs):
         stream, vods = client.user(**kwargs)
-        if stream:
-            self.addItem(stream.getItem(self.url, "stream"))
-        return self.addDirectory(vods, **kwargs)
+        return self.addDirectory(
+            vods,
+            headers=[stream.getItem(self.url, "stream")] if stream else [],
+            **kwargs
+        )
 
     # category -----------------------------------------------------------------
 
@@ -72,9 +85,10 @@ class DLivePlugin(Plugin):
 
     @action()
     def home(self, **kwargs):
-        if self.addDirectory(Folders(home)):
-            return self.addSettings()
-        return False
+        footers = []
+        if getSetting("settings", bool):
+            footers.append(self.getSettingsItem())
+        return self.addDirectory(Folders(home), footers=footers)
 
     # featured -----------------------------------------------------------------
 
@@ -82,6 +96,17 @@ class DLivePlugin(Plugin):
     def featured(self, **kwargs):
         return self.addDirectory(client.featured(**kwargs), "stream")
 
+    # watchlist ----------------------------------------------------------------
+
+    @action(category=30010)
+    def watchlist(self, **kwargs):
+        streams, users = client.watchlist(**kwargs)
+        return self.addDirectory(
+            streams,
+            "stream",
+            footers=[user.getItem(self.url, "user") for user in users]
+        )
+
     # recommended --------------------------------------------------------------
 
     @action(category=30009)
@@ -106,6 +131,7 @@ class DLivePlugin(Plugin):
 
     def __search__(self, **kwargs):
         search_cache.push(kwargs)
+        search_history.promote(**kwargs)
         return self.addDirectory(
             client.search(**kwargs),
             search_queries[kwargs["query"]]["action"], **kwargs
@@ -122,14 +148,17 @@ class DLivePlugin(Plugin):
 
     def __history__(self, **kwargs):
         search_cache.clear()
-        if self.addNewSearch(**kwargs):
-            return self.addDirectory(
-                search_history.history(
-                    category=search_queries[kwargs["query"]]["category"],
-                    **kwargs
-                )
-            )
-        return False
+        return self.addDirectory(
+            search_history.history(
+                category=search_queries[kwargs["query"]]["category"],
+                **kwargs
+            ),
+            headers=[self.getNewSearchItem(**kwargs)],
+            footers=[
+                completionItem(self.url, text, action="search", **kwargs)
+                for text in search_history.completions(**kwargs)
+            ]
+        )
 
     @action(category=30002)
     def search(self, **kwargs):
@@ -5,6 +5,7 @@ from sys import argv
 
 from iapc.tools import getAddonId, containerUpdate, containerRefresh
 
+from dlive.client import client
 from dlive.persistence import search_history
 
 
@@ -19,6 +20,16 @@ def goToUser(username):
     containerUpdate(__user_url__.format(username))
 
 
+# watchlist --------------------------------------------------------------------
+
+def watchUser(username):
+    client.watch(username)
+
+def unwatchUser(username):
+    if client.unwatch(username):
+        containerRefresh()
+
+
 # search -----------------------------------------------------------------------
 
 def removeSearchQuery(query, text):
@@ -34,6 +45,8 @@ def clearSearchHistory(query=None):
 
 __dispatch__ = {
     "goToUser": goToUser,
+    "watchUser": watchUser,
+    "unwatchUser": unwatchUser,
     "removeSearchQuery": removeSearchQuery,
     "clearSearchHistory": clearSearchHistory
 }
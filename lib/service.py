@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 
 
-from requests import Session, Timeout
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+)
+from email.utils import parsedate_to_datetime
+from functools import partial
+from json import dump, load
+from os import replace
+from random import uniform
+from threading import Event, Lock, Thread
+from time import monotonic, sleep, time
+
+from requests import RequestException, Session, Timeout
 
 from iapc import Service, public
 from iapc.tools import makeProfile, getSetting, getLanguage, containerRefresh
 
-from dlive.graphql import GraphQLError, queries
-from dlive.utils import Cache
+from dlive.artwork import ArtworkCache
+from dlive.cache import ResponseCache, SingleFlight
+from dlive.compact import pack
+from dlive.graphql import Batch, GraphQLError, PersistedQueries, queries
+from dlive.index import PrefixIndex, normalize
+from dlive.utils import Cache, getProfilePath
 
 
 # ------------------------------------------------------------------------------
@@ -22,23 +38,202 @@ class Categories(Cache, key="backendID"):
         "watchingCount": 0
     }
 
-    def __init__(self, data=None):
-        super().__init__(data["list"] if data else [])
+    def __init__(self, path):
+        super().__init__()
+        self.__path__ = path
+        self.__lock__ = Lock()
+        self.timestamp = 0
+
+    # the index is read without locking by the serving threads (single key
+    # lookups), it is only mutated under the lock, and never iterated
+    # outside of it
 
     def update(self, data):
-        return super().update(data["list"])
+        with self.__lock__:
+            return super().update(data["list"])
+
+    def load(self):
+        try:
+            with open(self.__path__, "r") as f:
+                data = load(f)
+        except (OSError, ValueError):
+            return False
+        self.update(data)
+        self.timestamp = data.get("timestamp", 0)
+        return True
+
+    def save(self):
+        path = f"{self.__path__}.tmp"
+        with self.__lock__:
+            with open(path, "w") as f:
+                dump(
+                    {"timestamp": self.timestamp, "list": list(self.values())},
+                    f
+                )
+            replace(path, self.__path__)
+
+    def sync(self, pages):
+        # the new index is fetched off to the side, then merged in: stale
+        # categories are dropped after the fresh ones are in, readers never
+        # miss a category that is still there
+        fresh = {}
+        for data in pages:
+            fresh.update(
+                (self.get_key(item), item) for item in data["list"]
+            )
+        with self.__lock__:
+            super().update(fresh.values())
+            for key in (set(self) - set(fresh)):
+                self.pop(key, None)
+            self.timestamp = time()
+        self.save()
+
+
+# ------------------------------------------------------------------------------
+# Watchlist
+
+class Watchlist(dict):
+
+    # username -> user (with its livestream) if live, False if the user
+    # wasn't found (renamed, deleted), None otherwise
+
+    def __init__(self, path):
+        super().__init__()
+        self.__path__ = path
+
+    def load(self):
+        try:
+            with open(self.__path__, "r") as f:
+                data = load(f)
+        except (OSError, ValueError):
+            return False
+        self.update(dict.fromkeys(data["usernames"]))
+        return True
+
+    def save(self):
+        path = f"{self.__path__}.tmp"
+        with open(path, "w") as f:
+            dump({"usernames": list(self)}, f)
+        replace(path, self.__path__)
+
+
+# ------------------------------------------------------------------------------
+# CircuitBreaker
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.__threshold__ = threshold
+        self.__cooldown__ = cooldown
+        self.__failures__ = 0
+        self.__opened__ = None
+        self.__lock__ = Lock()
+
+    @property
+    def state(self):
+        return "closed" if self.__opened__ is None else "open"
+
+    def check(self):
+        with self.__lock__:
+            if self.__opened__ is not None:
+                if (monotonic() - self.__opened__) < self.__cooldown__:
+                    raise CircuitOpenError("service unavailable")
+                # half-open, let this request through and hold the others
+                # until it's done (or for another cooldown)
+                self.__opened__ = monotonic()
+
+    def success(self):
+        with self.__lock__:
+            self.__failures__ = 0
+            self.__opened__ = None
+
+    def failure(self):
+        with self.__lock__:
+            self.__failures__ += 1
+            if self.__failures__ >= self.__threshold__:
+                self.__opened__ = monotonic()
+
+
+# ------------------------------------------------------------------------------
+# Latencies
+
+class Latencies(object):
+
+    def __init__(self, size=64, minimum=8):
+        self.__size__ = size
+        self.__minimum__ = minimum
+        self.__samples__ = {}
+        self.__lock__ = Lock()
+
+    def add(self, name, latency):
+        with self.__lock__:
+            try:
+                samples = self.__samples__[name]
+            except KeyError:
+                samples = self.__samples__[name] = deque(maxlen=self.__size__)
+            samples.append(latency)
+
+    def percentile(self, name, percent):
+        # None until we have enough samples
+        with self.__lock__:
+            samples = sorted(self.__samples__.get(name, ()))
+        if len(samples) < self.__minimum__:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def stats(self):
+        return {
+            name: {
+                f"p{percent}": self.percentile(name, percent)
+                for percent in (50, 95)
+            }
+            for name in list(self.__samples__)
+        }
 
 
 # ------------------------------------------------------------------------------
 # DLiveSession
 
+def __retry_after__(response):
+    try:
+        value = response.headers["Retry-After"]
+    except (AttributeError, KeyError):
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+        except (TypeError, ValueError):
+            return None
+
+
 class DLiveSession(Session):
 
+    __transient__ = {429, 500, 502, 503, 504}
+    __retry_after_statuses__ = {429, 503}
+
+    __retries__ = 2
+    # seconds
+    __backoff__ = 0.5
+    __max_delay__ = 10.0
+
+    # adaptive read timeout: p95 * factor, between floor and the setting
+    __adaptive_factor__ = 3.0
+    __adaptive_floor__ = 2.0
+
     def __init__(self, logger, headers=None):
         super().__init__()
         self.logger = logger.getLogger("service.session")
         if headers:
             self.headers.update(headers)
+        self.__breaker__ = CircuitBreaker()
+        self.latencies = Latencies()
+        self.retries = 0
         self.__setup__(True)
 
     def __setup__(self, init=False):
@@ -46,34 +241,205 @@ class DLiveSession(Session):
             self.timeout = None
         else:
             self.timeout = (((timeout - (timeout % 3)) + 0.05), timeout)
+        self.__adaptive__ = getSetting("adaptive", bool)
         if not init:
             self.logger.info(f"timeout: {self.timeout}")
+            self.logger.info(f"adaptive: {self.__adaptive__}")
 
-    def request(self, *args, **kwargs):
-        response = super().request(*args, timeout=self.timeout, **kwargs)
-        response.raise_for_status()
-        return response
+    def __timeout__(self, name, attempt):
+        # retries always get the full timeout, only the read timeout adapts
+        # (connect stays just past a multiple of 3s, tcp retransmits)
+        if (
+            (not self.__adaptive__) or
+            (attempt > 0) or
+            ((p95 := self.latencies.percentile(name, 95)) is None)
+        ):
+            return self.timeout
+        read = max(self.__adaptive_floor__, p95 * self.__adaptive_factor__)
+        if self.timeout is None:
+            return (None, read)
+        connect, timeout = self.timeout
+        return (connect, min(timeout, read))
+
+    def __delay__(self, attempt, response):
+        if (
+            (response is not None) and
+            (response.status_code in self.__retry_after_statuses__) and
+            ((delay := __retry_after__(response)) is not None)
+        ):
+            return delay
+        # full jitter
+        return uniform(0.0, self.__backoff__ * (2 ** attempt))
+
+    def request(self, *args, idempotent=False, name=None, **kwargs):
+        attempt = 0
+        while True:
+            self.__breaker__.check()
+            try:
+                start = monotonic()
+                response = super().request(
+                    *args, timeout=self.__timeout__(name, attempt), **kwargs
+                )
+                response.raise_for_status()
+            except RequestException as error:
+                response = error.response
+                if not (
+                    (response is None) or
+                    (response.status_code in self.__transient__)
+                ):
+                    # the server answered, it's healthy
+                    self.__breaker__.success()
+                    raise
+                self.__breaker__.failure()
+                if (
+                    (not idempotent) or
+                    (attempt >= self.__retries__) or
+                    ((delay := self.__delay__(attempt, response)) >
+                     self.__max_delay__)
+                ):
+                    raise
+                attempt += 1
+                self.retries += 1
+                self.logger.info(f"retrying in {delay:.2f}s [{error}]")
+                sleep(delay)
+            else:
+                self.__breaker__.success()
+                if name is not None:
+                    self.latencies.add(name, monotonic() - start)
+                return response
+
+    def stats(self):
+        return {"retries": self.retries, "circuit": self.__breaker__.state}
 
 
 # ------------------------------------------------------------------------------
 # DLiveService
 
+class StoppingError(Exception):
+    pass
+
+
+def __packed__(data):
+    # don't modify the cached result in place
+    return dict(data, list=pack(data["list"]))
+
+
 class DLiveService(Service):
 
     __headers__ = {}
 
     __url__ = "https://graphigo.prd.dlive.tv/"
 
+    # seconds
+    __ttls__ = {
+        "live": 5,
+        "user": 60,
+        "vods": 300,
+        "featured": 60,
+        "recommended": 300,
+        "streams": 60,
+        "categories": 3600,
+        "search_users": 300,
+        "search_categories": 3600
+    }
+
+    # seconds, how often the category index is fully synced
+    __categories_ttl__ = 86400
+    __categories_page__ = 64
+
+    # background requests (revalidations, prefetches, startup tasks, ...)
+    __workers__ = 4
+
+    # startup tasks retries, seconds (doubled after each attempt)
+    __retries__ = 5
+    __backoff__ = 2.0
+
+    # where to find pageInfo in paged results, and the next page's query
+    __paged__ = {
+        "user": (("pastBroadcasts", "pageInfo"), "vods"),
+        "vods": (("pastBroadcasts", "pageInfo"), "vods"),
+        "streams": (("pageInfo",), "streams"),
+        "categories": (("pageInfo",), "categories"),
+        "search_users": (("pageInfo",), "search_users"),
+        "search_categories": (("pageInfo",), "search_categories")
+    }
+
+    # seconds, prefetched pages are short-lived
+    __prefetch_ttl__ = 30
+
+    # seconds, a stream seen in a listing is assumed to still be live
+    __live_ttl__ = 30
+
+    # minutes -> seconds
+    __watchlist_unit__ = 60
+
+    # interactive queries that may be hedged, at most 10% of the time
+    __hedged__ = {"live", "user"}
+    __hedge_budget__ = 0.1
+    # hedged requests (first and hedge) don't queue behind background ones
+    __hedge_workers__ = 4
+
+    # seconds, how long stopping waits for the watchlist poller (it may be
+    # in the middle of a request, it is a daemon thread past that)
+    __join_timeout__ = 5.0
+
     def __init__(self, *args, **kwargs):
+        self.__started__ = monotonic()
+        self.__timings__ = {}
         super().__init__(*args, **kwargs)
+        self.__stopping__ = Event()
+        self.__executor__ = ThreadPoolExecutor(
+            max_workers=self.__workers__, thread_name_prefix="dlive"
+        )
+        self.__hedger__ = ThreadPoolExecutor(
+            max_workers=self.__hedge_workers__, thread_name_prefix="hedge"
+        )
         self.__session__ = DLiveSession(self.logger, headers=self.__headers__)
-        self.__categories__ = Categories(self.query("categories", first=64))
+        self.__cache__ = ResponseCache()
+        self.__live__ = ResponseCache(maxsize=512)
+        self.__artwork__ = ArtworkCache(
+            self.logger, Session(), getProfilePath("artwork")
+        )
+        self.__suggestions__ = PrefixIndex()
+        self.__searches__ = ResponseCache(maxsize=128)
+        self.__refined__ = 0
+        self.__flight__ = SingleFlight()
+        self.__apq__ = PersistedQueries()
+        self.__hedgeable__ = 0
+        self.__hedges__ = 0
+        self.__lock__ = Lock()
+        self.__revalidating__ = set()
+        self.__prefetching__ = {}
         makeProfile()
+        self.__categories__ = Categories(getProfilePath("categories.json"))
+        self.__watchlist__ = Watchlist(getProfilePath("watchlist.json"))
 
     def start(self, **kwargs):
         self.logger.info("starting...")
         self.__setup__()
+        # nothing here should wait on the network
+        self.__categories__.load()
+        self.__suggestions__.feed(list(self.__categories__.values()))
+        if (time() - self.__categories__.timestamp) > self.__categories_ttl__:
+            self.__background__("categories", self.__sync_categories__)
+        self.__background__("warmup", self.__warmup__)
+        self.submit(self.__artwork__.start)
+        self.__watchlist__.load()
+        watchlist = Thread(
+            target=self.__poll_watchlist__, name="watchlist", daemon=True
+        )
+        watchlist.start()
+        self.__timing__("serve")
         self.serve(**kwargs)
+        self.__stopping__.set()
+        watchlist.join(self.__join_timeout__)
+        # queued prefetches, revalidations, ... are dropped, only the running
+        # ones are waited for on exit
+        self.__executor__.shutdown(wait=False, cancel_futures=True)
+        self.__hedger__.shutdown(wait=False, cancel_futures=True)
+        self.__artwork__.stop()
+        self.__categories__.save()
+        self.logger.info(f"stats: {self.stats()}")
         self.logger.info("stopped")
 
     def onSettingsChanged(self):
@@ -82,22 +448,100 @@ class DLiveService(Service):
 
     # --------------------------------------------------------------------------
 
+    def submit(self, func, *args, **kwargs):
+        return self.__executor__.submit(func, *args, **kwargs)
+
+    def __timing__(self, name):
+        # seconds since the service was created
+        self.__timings__[name] = round(monotonic() - self.__started__, 3)
+        self.logger.info(f"{name}: {self.__timings__[name]}s")
+
+    def __retry__(self, name, target):
+        delay = self.__backoff__
+        for attempt in range(1, self.__retries__ + 1):
+            try:
+                target()
+            except Exception as error:
+                self.logger.warning(
+                    f"{name} failed (attempt {attempt}) [{error}]"
+                )
+            else:
+                return self.__timing__(name)
+            if self.__stopping__.wait(delay):
+                break
+            delay *= 2
+        self.logger.warning(f"{name} abandoned")
+
+    def __background__(self, name, target):
+        return self.submit(self.__retry__, name, target)
+
+    # --------------------------------------------------------------------------
+
     def __setup__(self):
         self.__first__ = getSetting("first", int)
         self.__nsfw__ = getSetting("nsfw", bool)
         self.__language__ = getLanguage()
+        self.__prefetch__ = getSetting("prefetch", int)
+        self.__apq__.enabled = getSetting("persisted", bool)
+        self.__hedging__ = getSetting("hedging", bool)
+        self.__watchlist_interval__ = (
+            getSetting("watchlist", int) * self.__watchlist_unit__
+        )
+        # MiB, lowering it evicts right away (all of it at 0)
+        self.__artwork__.resize(getSetting("artwork", int) * 1048576)
         self.__session__.__setup__()
 
+    # watchlist ----------------------------------------------------------------
+
+    def __check_watchlist__(self):
+        # the liveness of all watched users, in one round trip
+        if not (usernames := list(self.__watchlist__)):
+            return
+        results = self.batch(
+            *(("live", {"username": username}) for username in usernames)
+        )
+        for username, result in zip(usernames, results):
+            if isinstance(result, Exception):
+                self.logger.warning(
+                    f"failed to check '{username}' [{result}]"
+                )
+                continue
+            if result is None:
+                live = False
+            else:
+                live = result if result.get("livestream") else None
+            with self.__lock__:
+                if username in self.__watchlist__:
+                    self.__watchlist__[username] = live
+            if live:
+                self.__live__.set(username, live, self.__live_ttl__)
+
+    def __poll_watchlist__(self):
+        while not self.__stopping__.is_set():
+            try:
+                self.__check_watchlist__()
+            except Exception as error:
+                self.logger.warning(f"watchlist check failed [{error}]")
+            self.__stopping__.wait(self.__watchlist_interval__)
+
     # --------------------------------------------------------------------------
 
-    def query(self, query, key=None, **kwargs):
-        query, keys = queries[query]
-        json = {"query": query}
-        if kwargs:
-            json.update(variables=kwargs)
-        response = self.__session__.post(self.__url__, json=json).json()
-        data = response.get("data", None)
-        errors = response.get("errors", None)
+    def __post__(self, name, json):
+        # all our operations are queries
+        return self.__session__.post(
+            self.__url__, json=json, idempotent=True, name=name
+        ).json()
+
+    def __request__(self, name, document, sha256, variables=None):
+        supported = self.__apq__.supported
+        response = self.__apq__.request(
+            partial(self.__post__, name), document, sha256, variables
+        )
+        if supported and not self.__apq__.supported:
+            self.logger.warning("persisted queries not supported, disabled")
+        return response
+
+    def __result__(self, keys, data=None, errors=None):
         if errors is not None:
             error = GraphQLError(errors)
             if data is None:
@@ -106,6 +550,262 @@ class DLiveService(Service):
                 self.logger.warning(f"query error [{error}]")
         for k in keys:
             data = data[k]
+        return data
+
+    def __query__(self, name, **kwargs):
+        query = queries[name]
+        response = self.__request__(
+            name, query.document, query.sha256, kwargs
+        )
+        return self.__result__(
+            query.keys, response.get("data", None), response.get("errors", None)
+        )
+
+    def __seen__(self, query, data):
+        # remember who was live in listings
+        if query == "streams":
+            livestreams = data["list"]
+        elif query == "featured":
+            livestreams = (item["item"] for item in data)
+        else:
+            return
+        for livestream in livestreams:
+            if livestream and (creator := livestream.get("creator")):
+                self.__live__.set(
+                    creator["username"],
+                    dict(creator, livestream=livestream),
+                    self.__live_ttl__
+                )
+
+    def __store__(self, cache_key, query, data, ttl=None):
+        if (ttl is None) or (ttl > self.__ttls__[query]):
+            ttl = self.__ttls__[query]
+        self.__cache__.set(cache_key, data, ttl)
+        self.__seen__(query, data)
+        self.__suggestions__.feed(data)
+        self.__artwork__.fetch(data)
+
+    def __hedge__(self, name, **kwargs):
+        # if the first request doesn't answer within the observed p90, send
+        # a second one and use whichever answers first
+        if (
+            (not self.__hedging__) or
+            (name not in self.__hedged__) or
+            ((delay := self.__session__.latencies.percentile(name, 90)) is None)
+        ):
+            return self.__query__(name, **kwargs)
+        with self.__lock__:
+            self.__hedgeable__ += 1
+        first = self.__hedger__.submit(self.__query__, name, **kwargs)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        with self.__lock__:
+            if (hedge := (
+                self.__hedges__ <
+                max(1, self.__hedge_budget__ * self.__hedgeable__)
+            )):
+                self.__hedges__ += 1
+        if not hedge:
+            return first.result()
+        self.logger.info(f"hedging '{name}' after {delay:.3f}s")
+        pending = {
+            first, self.__hedger__.submit(self.__query__, name, **kwargs)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        # both failed
+        return first.result()
+
+    def __fetch__(self, cache_key, query, **kwargs):
+        data = self.__flight__(cache_key, self.__hedge__, query, **kwargs)
+        self.__store__(cache_key, query, data)
+        return data
+
+    def __fallback__(self, cache_key, query, **kwargs):
+        try:
+            return self.__fetch__(cache_key, query, **kwargs)
+        except (CircuitOpenError, RequestException) as error:
+            # graphigo is unhealthy, serve what we have, however stale
+            try:
+                data, fresh = self.__cache__.lookup(cache_key, stale=True)
+            except KeyError:
+                raise error
+            self.logger.warning(f"serving stale '{query}' [{error}]")
+            return data
+
+    def __refresh__(self, cache_key, query, **kwargs):
+        try:
+            self.__fetch__(cache_key, query, **kwargs)
+        except Exception as error:
+            self.logger.warning(f"failed to refresh '{query}' [{error}]")
+        finally:
+            with self.__lock__:
+                self.__revalidating__.discard(cache_key)
+
+    def __revalidate__(self, cache_key, query, **kwargs):
+        with self.__lock__:
+            if cache_key in self.__revalidating__:
+                return
+            self.__revalidating__.add(cache_key)
+        self.submit(self.__refresh__, cache_key, query, **kwargs)
+
+    # batch --------------------------------------------------------------------
+
+    def batch(self, *requests):
+        # requests are (query, kwargs) tuples, cached results are reused and
+        # the others are sent as one aliased query. like gather() with
+        # return_exceptions=True, failed parts are returned as exceptions
+        results = [None] * len(requests)
+        batch, pending = Batch(), {}
+        for i, (query, kwargs) in enumerate(requests):
+            cache_key = self.__cache__.key(query, **kwargs)
+            try:
+                results[i] = self.__cache__.get(cache_key)
+            except KeyError:
+                pending[batch.add(query, **kwargs)] = (i, cache_key, query)
+        if pending:
+            response = self.__request__(
+                "batch", batch.document, batch.sha256, batch.variables
+            )
+            for j, (data, errors) in enumerate(batch.split(response)):
+                i, cache_key, query = pending[j]
+                try:
+                    results[i] = self.__result__(
+                        queries[query].keys, data, errors
+                    )
+                except Exception as error:
+                    results[i] = error
+                else:
+                    self.__store__(cache_key, query, results[i])
+        return results
+
+    def __warmup__(self):
+        # the home screen views, in one round trip (on retry, only the
+        # failed parts are sent again)
+        results = self.batch(
+            ("featured", {"userLanguageCode": self.__language__}),
+            ("recommended", {}),
+            ("streams", {"first": self.__first__, "showNSFW": self.__nsfw__}),
+            ("categories", {"first": self.__first__})
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        self.__categories__.update(results[-1])
+
+    # categories ---------------------------------------------------------------
+
+    def __category_pages__(self):
+        after = "-1"
+        while True:
+            if self.__stopping__.is_set():
+                # a partial sync would drop the categories not fetched yet
+                raise StoppingError("service stopping")
+            data = self.__query__(
+                "categories", first=self.__categories_page__, after=after
+            )
+            yield data
+            if not data["pageInfo"]["hasNextPage"]:
+                break
+            after = data["pageInfo"]["endCursor"]
+
+    def __sync_categories__(self):
+        self.__categories__.sync(self.__category_pages__())
+        self.logger.info(f"categories synced ({len(self.__categories__)})")
+
+    def __learn_category__(self, categoryID, data):
+        # from the (partial) category of streams in that category
+        self.__categories__.update(
+            {
+                "list": [
+                    dict(self.__categories__.missing, **category)
+                    for item in data["list"][:1]
+                    if (category := item.get("category")) and
+                    (str(category["backendID"]) == categoryID)
+                ]
+            }
+        )
+
+    def __resolve_category__(self, categoryID):
+        # categories can't be queried by id, but their live streams can
+        try:
+            data = self.__query__(
+                "streams", first=1, categoryID=categoryID, showNSFW=True
+            )
+        except Exception as error:
+            self.logger.warning(
+                f"failed to resolve category '{categoryID}' [{error}]"
+            )
+        else:
+            self.__learn_category__(categoryID, data)
+
+    # prefetch -----------------------------------------------------------------
+
+    def __prefetch_page__(self, cancelled, cache_key, query, **kwargs):
+        try:
+            if not cancelled.is_set():
+                data = self.__flight__(
+                    cache_key, self.__query__, query, **kwargs
+                )
+                if not cancelled.is_set():
+                    self.__store__(
+                        cache_key, query, data, ttl=self.__prefetch_ttl__
+                    )
+        except Exception as error:
+            self.logger.warning(f"failed to prefetch '{query}' [{error}]")
+        finally:
+            with self.__lock__:
+                self.__prefetching__.pop(cache_key, None)
+
+    def __prefetch_next__(self, data, query, **kwargs):
+        if (self.__prefetch__ <= 0) or (query not in self.__paged__):
+            return
+        keys, query = self.__paged__[query]
+        for k in keys:
+            data = data.get(k) or {}
+        if not data.get("hasNextPage", False):
+            return
+        kwargs["after"] = data["endCursor"]
+        cache_key = self.__cache__.key(query, **kwargs)
+        if cache_key in self.__cache__:
+            return
+        with self.__lock__:
+            if (
+                (cache_key in self.__prefetching__) or
+                (len(self.__prefetching__) >= self.__prefetch__)
+            ):
+                return
+            cancelled = self.__prefetching__[cache_key] = Event()
+        self.submit(
+            self.__prefetch_page__, cancelled, cache_key, query, **kwargs
+        )
+
+    def __cancel_prefetches__(self, cache_key):
+        # the user moved away, cancel everything but the requested page
+        with self.__lock__:
+            for key, cancelled in self.__prefetching__.items():
+                if key != cache_key:
+                    cancelled.set()
+
+    # --------------------------------------------------------------------------
+
+    def query(self, query, key=None, stale=False, **kwargs):
+        cache_key = self.__cache__.key(query, **kwargs)
+        self.__cancel_prefetches__(cache_key)
+        try:
+            data, fresh = self.__cache__.lookup(cache_key, stale=stale)
+        except KeyError:
+            data = self.__fallback__(cache_key, query, **kwargs)
+        else:
+            if not fresh:
+                # stale-while-revalidate
+                self.__revalidate__(cache_key, query, **kwargs)
+        self.__prefetch_next__(data, query, **kwargs)
         if key is not None:
             return [item[key] for item in data]
         return data
@@ -114,53 +814,210 @@ class DLiveService(Service):
 
     @public
     def stream(self, **kwargs):
-        return self.query("stream", **kwargs)
+        # fast path, the user was seen live in a listing seconds ago
+        try:
+            return self.__live__.get(kwargs["username"])
+        except KeyError:
+            return self.query("live", **kwargs)
 
     @public
     def user(self, **kwargs):
-        return self.query("user", first=self.__first__, **kwargs)
+        # the livestream is only needed with the first page
+        data = self.query(
+            "user" if kwargs.get("after", "-1") == "-1" else "vods",
+            first=self.__first__,
+            **kwargs
+        )
+        if (vods := data.get("pastBroadcasts")):
+            data = dict(data, pastBroadcasts=__packed__(vods))
+        return data
 
     @public
     def category(self, **kwargs):
-        # unfortunately I couldn't find a way to get 1 category from its id
-        return self.__categories__[kwargs["categoryID"]]
+        # one lookup, a sync may drop the category in between two
+        categoryID = str(kwargs["categoryID"])
+        if (category := self.__categories__.get(categoryID)) is None:
+            self.__resolve_category__(categoryID)
+            category = self.__categories__[categoryID]
+        return category
+
+    @public
+    def category_streams(self, **kwargs):
+        # the streams of a category, labeled with the category title, the
+        # title comes from the index or from the streams themselves
+        data = self.__streams__(**kwargs)
+        categoryID = str(kwargs["categoryID"])
+        if (category := self.__categories__.get(categoryID)) is None:
+            self.__learn_category__(categoryID, data)
+            category = self.__categories__[categoryID]
+        return dict(__packed__(data), category=category["title"])
 
     # --------------------------------------------------------------------------
 
     @public
     def featured(self, **kwargs):
-        return self.query(
-            "featured", key="item", userLanguageCode=self.__language__, **kwargs
+        return pack(
+            self.query(
+                "featured",
+                key="item",
+                stale=True,
+                userLanguageCode=self.__language__,
+                **kwargs
+            )
         )
 
     @public
     def recommended(self, **kwargs):
-        return self.query("recommended", key="user", **kwargs)
+        return self.query("recommended", key="user", stale=True, **kwargs)
 
-    @public
-    def streams(self, **kwargs):
+    def __streams__(self, **kwargs):
         return self.query(
-            "streams", first=self.__first__, showNSFW=self.__nsfw__, **kwargs
+            "streams",
+            stale=(kwargs.get("after", "-1") == "-1"),
+            first=self.__first__,
+            showNSFW=self.__nsfw__,
+            **kwargs
         )
 
+    @public
+    def streams(self, **kwargs):
+        return __packed__(self.__streams__(**kwargs))
+
     @public
     def categories(self, **kwargs):
         data = self.query("categories", first=self.__first__, **kwargs)
         self.__categories__.update(data)
         return data
 
-    @public
-    def search_users(self, **kwargs):
-        result = self.query("search_users", first=self.__first__, **kwargs)
-        result["list"] = [item.get("creator", item) for item in result["list"]]
+    # search -------------------------------------------------------------------
+
+    __matched__ = ("username", "displayname", "title")
+
+    def __refine__(self, query, text):
+        # filter the complete result of a shorter text, longest first
+        for end in range(len(text) - 1, 0, -1):
+            try:
+                result = self.__searches__.get((query, text[:end]))
+            except KeyError:
+                continue
+            if not result["pageInfo"].get("hasNextPage", True):
+                with self.__lock__:
+                    self.__refined__ += 1
+                return dict(
+                    result,
+                    list=[
+                        item for item in result["list"]
+                        if any(
+                            text in normalize(value)
+                            for field in self.__matched__
+                            if (value := item.get(field))
+                        )
+                    ]
+                )
+        return None
+
+    def __search__(self, query, search, **kwargs):
+        # first pages are cached by normalized text
+        kwargs["text"] = text = normalize(kwargs["text"])
+        if kwargs.get("after", "-1") != "-1":
+            return search(**kwargs)
+        key = (query, text)
+        try:
+            return self.__searches__.get(key)
+        except KeyError:
+            pass
+        if (result := self.__refine__(query, text)) is None:
+            result = search(**kwargs)
+        self.__searches__.set(key, result, self.__ttls__[query])
         return result
 
+    def __search_users__(self, **kwargs):
+        result = self.query("search_users", first=self.__first__, **kwargs)
+        # don't modify the cached result in place
+        return dict(
+            result,
+            list=[item.get("creator", item) for item in result["list"]]
+        )
+
     @public
-    def search_categories(self, **kwargs):
+    def search_users(self, **kwargs):
+        return self.__search__("search_users", self.__search_users__, **kwargs)
+
+    def __search_categories__(self, **kwargs):
         data = self.query("search_categories", first=self.__first__, **kwargs)
         self.__categories__.update(data)
         return data
 
+    @public
+    def search_categories(self, **kwargs):
+        return self.__search__(
+            "search_categories", self.__search_categories__, **kwargs
+        )
+
+    @public
+    def suggest(self, **kwargs):
+        return self.__suggestions__.suggest(**kwargs)
+
+    # watchlist ----------------------------------------------------------------
+
+    @public
+    def watch(self, **kwargs):
+        with self.__lock__:
+            if (username := kwargs["username"]) in self.__watchlist__:
+                return False
+            self.__watchlist__[username] = None
+            self.__watchlist__.save()
+        self.submit(self.__check_watchlist__)
+        return True
+
+    @public
+    def unwatch(self, **kwargs):
+        with self.__lock__:
+            if kwargs["username"] not in self.__watchlist__:
+                return False
+            del self.__watchlist__[kwargs["username"]]
+            self.__watchlist__.save()
+        return True
+
+    @public
+    def live_watchlist(self, **kwargs):
+        # the live streams, then every other watched user (offline or not
+        # found) so that any of them can be removed
+        with self.__lock__:
+            return {
+                "live": pack(
+                    [
+                        user["livestream"]
+                        for user in self.__watchlist__.values() if user
+                    ]
+                ),
+                "offline": [
+                    {"username": username, "found": (user is not False)}
+                    for username, user in self.__watchlist__.items()
+                    if not user
+                ]
+            }
+
+    # --------------------------------------------------------------------------
+
+    @public
+    def stats(self):
+        return {
+            "cache": self.__cache__.stats(),
+            "live": self.__live__.stats(),
+            "searches": dict(
+                self.__searches__.stats(), refined=self.__refined__
+            ),
+            "suggestions": len(self.__suggestions__),
+            "requests": dict(
+                self.__flight__.stats(),
+                hedges=self.__hedges__,
+                **self.__session__.stats()
+            ),
+            "latencies": self.__session__.latencies.stats(),
+            "startup": self.__timings__
+        }
+
 
 # __main__ ---------------------------------------------------------------------
 
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# python tests/bench_compact.py
+# a page of livestreams sent from the service to the plugin, per page size:
+# - plain: the list as is
+# - eager: packed, every row rebuilt as a dict on unpack (before)
+# - rows: packed, rows read in place (lazy lookups)
+# serialize: (pack and) json dumps, deserialize: json loads (and unpack),
+# read: the fields getItem reads, from every item
+
+
+from json import dumps, loads
+from os.path import abspath, dirname, join
+from sys import path
+from timeit import repeat
+
+__root__ = dirname(dirname(abspath(__file__)))
+path.insert(0, join(__root__, "lib"))
+
+from dlive.compact import pack, unpack
+
+
+def page(size):
+    # what the streams query selects (LivestreamItem)
+    return [
+        {
+            "ageRestriction": 0,
+            "thumbnailUrl": f"https://images.prd.dlivecdn.com/thumbnail/{i}",
+            "title": f"livestream {i}",
+            "createdAt": "1600000000000",
+            "watchingCount": i,
+            "language": {"code": "en"},
+            "category": {"backendID": i % 8, "title": f"category {i % 8}"},
+            "creator": {
+                "username": f"someone{i}", "displayname": f"Someone {i}"
+            }
+        }
+        for i in range(size)
+    ]
+
+
+def eager(data):
+    # unpack as it was, every field of every row rebuilt
+    fields, tables = data["fields"], data["tables"]
+    lookups = [tables.get(field) for field in fields]
+    return [
+        {
+            field: (
+                value if (lookup is None) or (value is None) else lookup[value]
+            )
+            for field, lookup, value in zip(fields, lookups, row)
+        }
+        for row in data["rows"]
+    ]
+
+
+def read(items):
+    return [
+        (
+            item["creator"]["username"], item["creator"]["displayname"],
+            item["title"], item["thumbnailUrl"], item["ageRestriction"],
+            item["watchingCount"], item["createdAt"],
+            item["category"]["title"], item["language"]["code"]
+        )
+        for item in items
+    ]
+
+
+__formats__ = {
+    "plain": (lambda items: items, lambda data: data),
+    "eager": (pack, eager),
+    "rows": (pack, unpack)
+}
+
+
+def best(func, *args):
+    return min(repeat(lambda: func(*args), number=200, repeat=5)) / 200 * 1000
+
+
+if __name__ == "__main__":
+    for size in (12, 24, 48, 96):
+        items = page(size)
+        print(f"{size} items")
+        for name, (serialize, deserialize) in __formats__.items():
+            wire = dumps(serialize(items))
+            result = deserialize(loads(wire))
+            assert read(result) == read(items)
+            print(
+                f"{name:>8}: "
+                f"serialize {best(lambda: dumps(serialize(items))):.3f}ms, "
+                f"deserialize {best(lambda: deserialize(loads(wire))):.3f}ms, "
+                f"read {best(read, result):.3f}ms, "
+                f"{len(wire)} bytes"
+            )
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# python tests/bench_records.py
+# building a 48 item page of livestreams and formatting their plots:
+# - objects: nested objects and dates converted upfront (Video items)
+# - records: records, plot formatted through nested objects (before)
+# - raw: records, plot formatted from the raw data
+
+
+from os.path import abspath, dirname, join
+from re import search
+from sys import path
+from timeit import repeat
+from tracemalloc import get_traced_memory, start, stop
+
+__root__ = dirname(dirname(abspath(__file__)))
+path.insert(0, join(__root__, "lib"))
+
+from dlive.records import Record, __date__, rawFormat
+
+
+def plot(id):
+    with open(
+        join(__root__, "resources/language/resource.language.en_gb/strings.po")
+    ) as f:
+        return search(
+            rf'msgctxt "#{id}"\nmsgid "(.*)"', f.read()
+        ).group(1).replace("\\n", "\n")
+
+
+class Object(dict):
+
+    # stands for iapc.tools.objects.Object
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class Livestream(Record):
+
+    __slots__ = ()
+
+    __transform__ = {"language": Object, "category": Object, "creator": Object}
+    __date__ = {"createdAt"}
+
+    __plot__ = plot(30055)
+    __raw_plot__ = rawFormat(__plot__)
+
+    @property
+    def rating(self):
+        return "NSFW" if self.ageRestriction else ""
+
+
+def eager(data):
+    # every nested object and date converted upfront, as Item does
+    item = Object(data)
+    for key, ctor in Livestream.__transform__.items():
+        item[key] = ctor(item[key])
+    item["createdAt"] = __date__(item["createdAt"])
+    item["rating"] = ""
+    return item
+
+
+__page__ = [
+    {
+        "permlink": f"someone{i}+abcdef",
+        "ageRestriction": 0,
+        "thumbnailUrl": f"https://images.prd.dlivecdn.com/thumbnail/{i}",
+        "title": f"livestream {i}",
+        "createdAt": "1600000000000",
+        "watchingCount": i,
+        "language": {"code": "en"},
+        "category": {"backendID": i % 8, "title": f"category {i % 8}"},
+        "creator": {"username": f"someone{i}", "displayname": f"Someone {i}"}
+    }
+    for i in range(48)
+]
+
+
+# the items are kept alive as long as the page is (Streams holds them)
+
+def objects():
+    items = [eager(data) for data in __page__]
+    return items, [Livestream.__plot__.format(item) for item in items]
+
+
+def records():
+    items = [Livestream(data) for data in __page__]
+    return items, [Livestream.__plot__.format(item) for item in items]
+
+
+def raw():
+    items = [Livestream(data) for data in __page__]
+    return items, [Livestream.__raw_plot__.format(item) for item in items]
+
+
+def allocated(func):
+    start()
+    result = func()
+    size, peak = get_traced_memory()
+    stop()
+    del result
+    return peak
+
+
+if __name__ == "__main__":
+    assert objects()[1] == records()[1] == raw()[1]
+    for func in (objects, records, raw):
+        best = min(repeat(func, number=1000, repeat=5))
+        print(
+            f"{func.__name__:>8}: {best:.3f}ms/page, "
+            f"{allocated(func)} bytes (peak)"
+        )
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+
+from os.path import abspath, dirname, join
+from sys import path
+
+
+# the addon's modules live in lib/ (that's Kodi's sys.path for the addon)
+path.insert(0, join(dirname(dirname(abspath(__file__))), "lib"))
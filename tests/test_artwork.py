@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+
+from os import listdir, utime
+from time import time
+
+from dlive.artwork import ArtworkCache, artworkPath, localArtwork
+
+
+class Logger(object):
+
+    def getLogger(self, name):
+        return self
+
+    def warning(self, message):
+        pass
+
+
+class Response(object):
+
+    def __init__(self, size, status=200):
+        self.size = size
+        self.status = status
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        if self.status != 200:
+            raise IOError(self.status)
+
+    def iter_content(self, chunk_size):
+        for start in range(0, self.size, chunk_size):
+            yield b"x" * min(chunk_size, self.size - start)
+
+
+class Session(object):
+
+    # url -> Response
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, **kwargs):
+        return self.responses[url]
+
+
+def cache(directory, budget=1000000, **responses):
+    cache = ArtworkCache(Logger(), Session(responses), str(directory))
+    cache.budget = budget
+    cache.start()
+    return cache
+
+
+def files(directory):
+    return sorted(listdir(directory))
+
+
+# download ---------------------------------------------------------------------
+
+def test_download(tmp_path):
+    artwork = cache(tmp_path, a=Response(1000), b=Response(300))
+    artwork.__download__("a")
+    artwork.__download__("b")
+    assert artwork.size == 1300
+    assert localArtwork(str(tmp_path), "a") == artworkPath(str(tmp_path), "a")
+
+
+def test_download_replaces(tmp_path):
+    responses = {"a": Response(1000)}
+    artwork = cache(tmp_path, **responses)
+    artwork.__download__("a")
+    responses["a"].size = 400
+    artwork.__download__("a")
+    # counted once, at its new size
+    assert artwork.size == 400
+    assert len(files(tmp_path)) == 1
+
+
+def test_download_failures(tmp_path):
+    artwork = cache(
+        tmp_path,
+        large=Response(ArtworkCache.__max_image_size__ + 1),
+        missing=Response(10, status=404)
+    )
+    artwork.__download__("large")
+    artwork.__download__("missing")
+    assert artwork.size == 0
+    # no temporary file left behind
+    assert files(tmp_path) == []
+
+
+# eviction ---------------------------------------------------------------------
+
+def test_start(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"x" * 100)
+    (tmp_path / "b.jpg.tmp").write_bytes(b"x" * 100)
+    assert cache(tmp_path).size == 100
+
+
+def test_evict(tmp_path):
+    now = time()
+    for i, name in enumerate("abcde"):
+        (path := tmp_path / f"{name}.jpg").write_bytes(b"x" * 100)
+        # a is the least recently used
+        utime(path, (now - 100 + i, now))
+    artwork = cache(tmp_path, budget=500)
+    assert artwork.size == 500
+    artwork.budget = 400
+    artwork.__evict__()
+    # down to 90% of the budget, least recently used first
+    assert artwork.size == 300
+    assert files(tmp_path) == ["c.jpg", "d.jpg", "e.jpg"]
+
+
+def test_evict_after_download(tmp_path):
+    artwork = cache(tmp_path, budget=1000, a=Response(600), b=Response(600))
+    artwork.__download__("a")
+    artwork.__download__("b")
+    assert artwork.size <= 900
+    assert len(files(tmp_path)) == 1
+
+
+def test_resize(tmp_path):
+    artwork = cache(tmp_path, a=Response(100), b=Response(100))
+    artwork.__download__("a")
+    artwork.__download__("b")
+    artwork.resize(0)
+    # caching disabled, all of it evicted
+    assert artwork.size == 0
+    assert files(tmp_path) == []
+    assert localArtwork(str(tmp_path), "a") is None
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+
+from re import findall
+
+from dlive.graphql import Batch, fragments, minify
+
+
+def batch():
+    batch = Batch()
+    assert batch.add("featured", userLanguageCode="en") == 0
+    assert batch.add("recommended") == 1
+    assert batch.add("streams", first=20, showNSFW=True) == 2
+    assert batch.add("live", username="someone") == 3
+    return batch
+
+
+# document ---------------------------------------------------------------------
+
+def test_variables():
+    document = batch().document
+    # prefixed per part, defaults kept
+    assert document.startswith(
+        "query _batch_("
+        "$_0_userLanguageCode:String,"
+        "$_2_first:Int,$_2_after:String=\"-1\",$_2_categoryID:Int=0,"
+        "$_2_showNSFW:Boolean=false,"
+        "$_3_username:String!"
+        "){"
+    )
+    assert batch().variables == {
+        "_0_userLanguageCode": "en",
+        "_2_first": 20,
+        "_2_showNSFW": True,
+        "_3_username": "someone"
+    }
+
+
+def test_roots():
+    document = batch().document
+    # aliased, arguments use the prefixed variables
+    assert (
+        "{_0_carousels:carousels(count:8,userLanguageCode:$_0_userLanguageCode)"
+        "{item{...on Livestream{...LivestreamItem}}}"
+    ) in document
+    assert "}_1_globalInfo:globalInfo{recommendChannels(limit:8)" in document
+    assert (
+        "}_2_livestreams:livestreams(input:{first:$_2_first,after:$_2_after,"
+        "categoryID:$_2_categoryID,showNSFW:$_2_showNSFW,order:TRENDING})"
+    ) in document
+    assert (
+        "}_3_user:user(username:$_3_username)"
+        "{username displayname livestream{...LivestreamItem}}}"
+    ) in document
+    # nothing but the roots is aliased
+    assert findall(r"(\w+):(?=\w+[({])", document) == [
+        "_0_carousels", "_1_globalInfo", "_2_livestreams", "_3_user"
+    ]
+    # no variable left unprefixed
+    assert not findall(r"\$(?!_\d_)\w+", document)
+
+
+def test_fragments():
+    document = batch().document
+    # merged, each defined once
+    for name in ("LivestreamItem", "CategoryRef", "UserItem"):
+        assert document.count(f"fragment {name} on") == 1
+    assert document.count("fragment ") == 3
+    # as defined
+    for name in ("LivestreamItem", "CategoryRef", "UserItem"):
+        assert minify(fragments[name]) in document
+
+
+def test_empty_variables():
+    batch = Batch()
+    batch.add("recommended")
+    assert batch.document.startswith("query _batch_{_0_globalInfo:globalInfo")
+    assert batch.variables == {}
+
+
+# split ------------------------------------------------------------------------
+
+__data__ = {
+    "_0_carousels": [{"item": {}}],
+    "_1_globalInfo": {"recommendChannels": []},
+    "_2_livestreams": {"list": []},
+    "_3_user": {"username": "someone"}
+}
+
+
+def test_split():
+    results = batch().split({"data": __data__})
+    assert results == [
+        ({"carousels": [{"item": {}}]}, None),
+        ({"globalInfo": {"recommendChannels": []}}, None),
+        ({"livestreams": {"list": []}}, None),
+        ({"user": {"username": "someone"}}, None)
+    ]
+
+
+def test_split_part_error():
+    error = {"message": "boom", "path": ["_2_livestreams", "list"]}
+    results = batch().split(
+        {"data": dict(__data__, _2_livestreams=None), "errors": [error]}
+    )
+    assert results[2] == (None, [error])
+    for i in (0, 1, 3):
+        assert results[i][0] is not None
+        assert results[i][1] is None
+
+
+def test_split_partial_error():
+    # the part still has data, it is returned along with the error
+    error = {"message": "boom", "path": ["_3_user", "livestream"]}
+    results = batch().split({"data": __data__, "errors": [error]})
+    assert results[3] == ({"user": {"username": "someone"}}, [error])
+
+
+def test_split_error_without_path():
+    error = {"message": "boom"}
+    results = batch().split({"data": __data__, "errors": [error]})
+    for data, errors in results:
+        assert data is not None
+        assert errors == [error]
+
+
+def test_split_null_data():
+    errors = [{"message": "boom"}, {"message": "bang", "path": None}]
+    results = batch().split({"data": None, "errors": errors})
+    assert results == [(None, errors)] * 4
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+
+from pickle import dumps, loads
+
+from dlive.compact import Row, pack, unpack
+from dlive.records import Record, rawFormat
+
+
+__items__ = [
+    {
+        "title": f"livestream {i}",
+        "watchingCount": i,
+        "category": {"backendID": i % 2, "title": f"category {i % 2}"},
+        "creator": {"username": f"someone{i}", "displayname": f"Someone {i}"},
+        "language": None
+    }
+    for i in range(4)
+]
+
+
+class Table(dict):
+
+    # counts the lookups into a table
+
+    reads = 0
+
+    def __getitem__(self, key):
+        Table.reads += 1
+        return super().__getitem__(key)
+
+
+def test_round_trip():
+    data = pack(__items__)
+    assert len(data["tables"]["category"]) == 2
+    rows = unpack(data)
+    assert all(isinstance(row, Row) for row in rows)
+    assert [dict(row) for row in rows] == __items__
+    assert rows == __items__
+
+
+def test_plain_list():
+    assert unpack(__items__) is __items__
+
+
+def test_lazy():
+    data = pack(__items__)
+    data["tables"] = {
+        key: Table(table) for key, table in data["tables"].items()
+    }
+    rows = unpack(data)
+    assert Table.reads == 0
+    assert rows[1]["title"] == "livestream 1"
+    assert Table.reads == 0
+    assert rows[1]["creator"]["displayname"] == "Someone 1"
+    assert Table.reads == 1
+    assert rows[1]["language"] is None
+    assert rows[1].get("permlink") is None
+    assert "permlink" not in rows[1]
+
+
+def test_record():
+    class Livestream(Record):
+        __slots__ = ()
+    row = unpack(pack(__items__))[3]
+    livestream = Livestream(row)
+    assert livestream.title == "livestream 3"
+    assert rawFormat("{0.creator.displayname} - {0.title}").format(
+        livestream
+    ) == "Someone 3 - livestream 3"
+    assert loads(dumps(row)) == __items__[3]
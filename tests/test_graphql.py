@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Thread
+from urllib.request import Request, urlopen
+
+import pytest
+
+from dlive.graphql import PersistedQueries, queries
+
+
+# a local stand-in for graphigo ------------------------------------------------
+
+class Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append(body)
+        response = self.server.answer(body)
+        data = dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+__data__ = {"data": {"user": {"username": "someone"}}}
+
+
+def apq(server):
+    # knows the hashes of the documents it has been sent
+    def answer(body):
+        sha256 = (
+            body.get("extensions", {}).get("persistedQuery", {})
+            .get("sha256Hash")
+        )
+        if "query" in body:
+            if sha256:
+                server.store.add(sha256)
+            return __data__
+        if sha256 in server.store:
+            return __data__
+        return {
+            "errors": [
+                {
+                    "message": "PersistedQueryNotFound",
+                    "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}
+                }
+            ]
+        }
+    return answer
+
+
+def unsupported(message):
+    def factory(server):
+        def answer(body):
+            if "query" in body:
+                return __data__
+            return {"errors": [{"message": message}]}
+        return answer
+    return factory
+
+
+@pytest.fixture
+def server(request):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.received, server.store = [], set()
+    server.answer = request.param(server)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def poster(server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    def post(json):
+        request = Request(
+            url,
+            data=dumps(json).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        with urlopen(request) as response:
+            return loads(response.read())
+    return post
+
+
+def request(apq, post, name="live", **variables):
+    query = queries[name]
+    return apq.request(post, query.document, query.sha256, variables)
+
+
+# persisted queries ------------------------------------------------------------
+
+@pytest.mark.parametrize("server", [apq], indirect=True)
+def test_registered_then_hash_only(server):
+    persisted = PersistedQueries()
+    persisted.enabled = True
+    post = poster(server)
+    assert request(persisted, post, username="someone") == __data__
+    assert request(persisted, post, username="someone") == __data__
+    first, second, third = server.received
+    assert "query" not in first
+    assert ("query" in second) and ("extensions" in second)
+    assert "query" not in third
+    assert third["variables"] == {"username": "someone"}
+    assert persisted.supported
+
+
+@pytest.mark.parametrize(
+    "server",
+    [
+        unsupported("PersistedQueryNotSupported"),
+        unsupported("Must provide query string."),
+    ],
+    indirect=True
+)
+def test_unsupported(server):
+    persisted = PersistedQueries()
+    persisted.enabled = True
+    post = poster(server)
+    assert request(persisted, post, username="someone") == __data__
+    assert not persisted.supported
+    # not tried again
+    assert request(persisted, post, username="someone") == __data__
+    first, second, third = server.received
+    assert "query" not in first
+    assert ("query" in second) and ("extensions" not in second)
+    assert ("query" in third) and ("extensions" not in third)
+
+
+@pytest.mark.parametrize("server", [apq], indirect=True)
+def test_disabled(server):
+    persisted = PersistedQueries()
+    assert request(persisted, poster(server), username="someone") == __data__
+    (first,) = server.received
+    assert ("query" in first) and ("extensions" not in first)
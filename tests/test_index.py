@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+
+from dlive.index import PrefixIndex, distinct, normalize
+
+
+def test_normalize():
+    assert normalize("  Some   One ") == normalize("some one")
+
+
+def test_distinct():
+    assert list(
+        distinct(["SomeOne", "someone", "Some  One", "some one", "other"])
+    ) == ["SomeOne", "Some  One", "other"]
+    assert list(distinct(["SomeOne", "someone2"], ("someone",))) == [
+        "someone2"
+    ]
+
+
+def test_suggest():
+    index = PrefixIndex()
+    index.feed(
+        {
+            "list": [
+                {"username": "someone", "displayname": "SomeOne"},
+                {"backendID": 1, "title": "Some Category"}
+            ]
+        }
+    )
+    assert [item["text"] for item in index.suggest("SOME")] == [
+        "Some Category", "SomeOne", "someone"
+    ]
+    assert index.suggest("some", query="search_categories") == [
+        {"query": "search_categories", "text": "Some Category"}
+    ]
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+
+from collections import OrderedDict
+from os import listdir
+
+from dlive.journal import Journal, Journaled
+
+
+class History(Journaled):
+
+    # SearchHistory's bookkeeping, without the Kodi bits
+
+    def __init__(self, path, legacy=None):
+        super().__init__(path)
+        if legacy is not None:
+            self.__legacy__ = lambda: legacy
+
+    def __restore__(self, data):
+        return OrderedDict(data or {})
+
+    def __dump__(self, state):
+        return dict(state)
+
+    def __apply__(self, state, action, *args):
+        if action == "new":
+            state[args[0]] = args[0]
+        elif action == "remove":
+            del state[args[0]]
+
+    def new(self, text):
+        self.__record__("new", text)
+
+    def remove(self, text):
+        self.__record__("remove", text)
+
+    def compact(self):
+        with self.__lock__:
+            self.__journal__.compact(self.__dump__(self.__sync__())).join()
+
+
+def test_reload(tmp_path):
+    path = str(tmp_path / "history")
+    history = History(path)
+    for i in range(5):
+        history.new(f"t{i}")
+    assert list(History(path).state) == ["t0", "t1", "t2", "t3", "t4"]
+
+
+def test_other_process_changes(tmp_path):
+    # script.py removes an entry while the plugin's interpreter lives on
+    path = str(tmp_path / "history")
+    plugin, script = History(path), History(path)
+    for i in range(5):
+        plugin.new(f"t{i}")
+    script.remove("t4")
+    assert "t4" not in plugin.state
+    plugin.compact()
+    assert "t4" not in History(path).state
+
+
+def test_interleaved_appends(tmp_path):
+    path = str(tmp_path / "history")
+    plugin, script = History(path), History(path)
+    plugin.new("t0")
+    script.state
+    plugin.new("t1")
+    script.new("t2")
+    plugin.new("t3")
+    assert list(plugin.state) == ["t0", "t1", "t2", "t3"]
+    assert list(script.state) == ["t0", "t1", "t2", "t3"]
+
+
+def test_other_process_compacts(tmp_path):
+    path = str(tmp_path / "history")
+    plugin, script = History(path), History(path)
+    plugin.new("t0")
+    script.new("t1")
+    script.compact()
+    plugin.new("t2")
+    assert list(plugin.state) == ["t0", "t1", "t2"]
+    assert list(History(path).state) == ["t0", "t1", "t2"]
+
+
+def test_stale_append_after_compaction(tmp_path):
+    # script doesn't know about the new generation yet
+    path = str(tmp_path / "history")
+    plugin, script = History(path), History(path)
+    plugin.new("t0")
+    script.state
+    plugin.compact()
+    assert script.__journal__.append(["new", "t1"]) is None
+    script.new("t1")
+    assert list(History(path).state) == ["t0", "t1"]
+
+
+def test_compaction_threshold(tmp_path):
+    path = str(tmp_path / "history")
+    history = History(path)
+    history.__journal__ = Journal(path, threshold=4)
+    for i in range(10):
+        history.new(f"t{i}")
+    # the first one may still be the one started by the threshold
+    history.compact()
+    history.compact()
+    assert list(History(path).state) == [f"t{i}" for i in range(10)]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_migration(tmp_path):
+    path = str(tmp_path / "history")
+    history = History(path, legacy={"t0": "t0", "t1": "t1"})
+    assert list(history.state) == ["t0", "t1"]
+    # once
+    assert list(History(path, legacy={"t2": "t2"}).state) == ["t0", "t1"]
+
+
+def test_concurrent_compactions(tmp_path):
+    # the plugin and script.py crossing the threshold at the same time
+    path = str(tmp_path / "history")
+    plugin, script = History(path), History(path)
+    for i in range(5):
+        plugin.new(f"t{i}")
+    script.new("t5")
+    threads = [
+        journaled.__journal__.compact(
+            journaled.__dump__(journaled.state)
+        )
+        for journaled in (plugin, script) for _ in range(10)
+    ]
+    for thread in threads:
+        thread.join()
+    assert list(History(path).state) == [f"t{i}" for i in range(6)]
+    assert not [
+        name for name in listdir(tmp_path) if name.endswith(".tmp")
+    ]
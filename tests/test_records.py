@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+
+from copy import copy, deepcopy
+from datetime import datetime
+from pickle import dumps, loads
+
+from dlive.records import Record, rawFormat
+
+
+class Creator(dict):
+
+    built = 0
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        Creator.built += 1
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+class Livestream(Record):
+
+    __slots__ = ()
+
+    __transform__ = {"creator": Creator}
+    __date__ = {"createdAt"}
+
+
+__data__ = {
+    "title": "title",
+    "createdAt": "1600000000000",
+    "creator": {"username": "someone", "displayname": "Someone"}
+}
+
+
+def test_raw_format():
+    assert rawFormat(
+        "{0.title}\n{0.creator.displayname}\n{0.a.b.c}"
+    ) == "{0.title}\n{0[creator][displayname]}\n{0[a][b][c]}"
+
+
+def test_attributes():
+    record = Livestream(__data__)
+    assert record.title == "title"
+    assert record.createdAt == datetime.fromtimestamp(1600000000)
+    assert record.creator.username == "someone"
+    assert record["creator"] is __data__["creator"]
+
+
+def test_raw_format_builds_nothing():
+    Creator.built = 0
+    record = Livestream(__data__)
+    assert rawFormat("{0.creator.displayname}").format(record) == "Someone"
+    assert Creator.built == 0
+    assert "{0.creator.displayname}".format(record) == "Someone"
+    assert Creator.built == 1
+
+
+def test_missing():
+    record = Livestream(__data__)
+    assert not hasattr(record, "missing")
+    assert not hasattr(Livestream.__new__(Livestream), "title")
+
+
+def test_copy():
+    record = Livestream(__data__)
+    assert copy(record).title == "title"
+    assert deepcopy(record).creator.displayname == "Someone"
+    assert loads(dumps(record)).title == "title"
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+
+# every field objects.py reads (directly, through properties and methods, or
+# in the plot strings) must be selected by the queries whose results it is
+# built from, the lean selections (CategoryRef, creator without avatar, ...)
+# would otherwise silently break a view.
+# the other way around, every field selected must be read by something
+
+
+from ast import (
+    Assign, Attribute, Call, ClassDef, Constant, FunctionDef, Name, Subscript,
+    parse as parseSource, walk
+)
+from os.path import abspath, dirname, join
+from re import compile, findall
+
+import pytest
+
+from dlive.graphql import queries
+
+
+__root__ = dirname(dirname(abspath(__file__)))
+
+
+# selections -------------------------------------------------------------------
+
+__token__ = compile(r'\.\.\.|"[^"]*"|[\w$]+|[^\s\w]')
+
+
+def __merge__(tree, other):
+    for key, value in other.items():
+        if key == "...":
+            tree.setdefault(key, []).extend(value)
+        elif isinstance(value, dict):
+            __merge__(tree.setdefault(key, {}), value)
+        else:
+            tree.setdefault(key, value)
+
+
+class Parser(object):
+
+    def __init__(self, document):
+        self.tokens = __token__.findall(document)
+        self.index = 0
+
+    def next(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def skip(self):
+        # (arguments or variables)
+        depth = 0
+        while True:
+            token = self.next()
+            depth += (token == "(") - (token == ")")
+            if not depth:
+                return
+
+    def selection(self):
+        assert self.next() == "{"
+        tree = {}
+        while (token := self.next()) != "}":
+            if token == "...":
+                if self.peek() == "on":
+                    self.index += 2
+                    __merge__(tree, self.selection())
+                elif self.peek() == "{":
+                    __merge__(tree, self.selection())
+                else:
+                    tree.setdefault("...", []).append(self.next())
+                continue
+            if self.peek() == ":":
+                # aliased, the data is under the alias
+                self.index += 2
+            if self.peek() == "(":
+                self.skip()
+            __merge__(
+                tree,
+                {token: self.selection() if self.peek() == "{" else None}
+            )
+        return tree
+
+    def definitions(self):
+        operation, fragments = None, {}
+        while self.index < len(self.tokens):
+            kind, name = self.next(), self.next()
+            if kind == "fragment":
+                self.index += 2
+                fragments[name] = self.selection()
+            else:
+                if self.peek() == "(":
+                    self.skip()
+                operation = self.selection()
+        return operation, fragments
+
+
+def __resolve__(tree, fragments):
+    for name in tree.pop("...", []):
+        __merge__(tree, fragments[name])
+        __resolve__(tree, fragments)
+    for value in tree.values():
+        if isinstance(value, dict):
+            __resolve__(value, fragments)
+    return tree
+
+
+def selection(query):
+    operation, fragments = Parser(queries[query].document).definitions()
+    return __resolve__(operation, fragments)
+
+
+def selected(tree, path):
+    for key in path:
+        if not isinstance(tree, dict) or key not in tree:
+            return False
+        tree = tree[key]
+    return True
+
+
+# reads ------------------------------------------------------------------------
+
+def __strings__():
+    with open(
+        join(__root__, "resources/language/resource.language.en_gb/strings.po")
+    ) as f:
+        strings = findall(r'msgctxt "#(\d+)"\nmsgid "(.*)"', f.read())
+    return {int(id): string.replace("\\n", "\n") for id, string in strings}
+
+
+def __classes__():
+    classes = {}
+    for module in ("objects", "records"):
+        with open(join(__root__, "lib", "dlive", f"{module}.py")) as f:
+            for node in parseSource(f.read()).body:
+                if isinstance(node, ClassDef):
+                    classes[node.name] = node
+    return classes
+
+
+class Reads(object):
+
+    # the data paths read by a class's members, followed through self.member
+    # and super().member (in the class's actual mro)
+
+    def __init__(self):
+        self.strings = __strings__()
+        self.nodes = __classes__()
+        self.mros = {}
+        stand_ins = {}
+        for name, node in self.nodes.items():
+            bases = []
+            for base in node.bases:
+                if (base := base.id) not in self.nodes:
+                    # iapc's Object, List, ...
+                    base = stand_ins.setdefault(base, f"__{base}__")
+                bases.append(base)
+            self.mros[name] = bases
+        built = {
+            name: type(name, (), {}) for name in stand_ins.values()
+        }
+        def build(name):
+            if name not in built:
+                built[name] = type(
+                    name, tuple(build(base) for base in self.mros[name]) or
+                    (object,), {}
+                )
+            return built[name]
+        self.mros = {
+            name: [cls.__name__ for cls in build(name).__mro__]
+            for name in self.nodes
+        }
+
+    def __member__(self, cls, name, start=0):
+        # (owner, node) of member name in cls's mro
+        for owner in self.mros[cls][start:]:
+            if (node := self.nodes.get(owner)) is None:
+                continue
+            for item in node.body:
+                if isinstance(item, FunctionDef) and item.name == name:
+                    return owner, item
+                if isinstance(item, Assign) and any(
+                    isinstance(target, Name) and target.id == name
+                    for target in item.targets
+                ):
+                    return owner, item
+        return None, None
+
+    def __plot__(self, cls):
+        owner, node = self.__member__(cls, "__plot__")
+        call = node.value
+        return self.strings[call.args[0].value]
+
+    def __chain__(self, node, aliases):
+        # ["a", "b"] for self.a.b, self["a"]["b"], self.get("a").get("b"),
+        # alias["b"] (alias = self["a"]), super().a ("super", "a")
+        if isinstance(node, Attribute) and (node.attr == "get"):
+            # the method, not a field
+            return None
+        keys = []
+        while True:
+            if isinstance(node, Attribute):
+                keys.insert(0, node.attr)
+                node = node.value
+            elif isinstance(node, Subscript) and isinstance(
+                (key := node.slice), Constant
+            ):
+                keys.insert(0, key.value)
+                node = node.value
+            elif (
+                isinstance(node, Call) and isinstance(node.func, Attribute) and
+                (node.func.attr == "get") and node.args and
+                isinstance(node.args[0], Constant)
+            ):
+                keys.insert(0, node.args[0].value)
+                node = node.func.value
+            elif isinstance(node, Call) and isinstance(node.func, Name) and (
+                node.func.id == "super"
+            ):
+                return ["super", *keys]
+            elif isinstance(node, Name):
+                if node.id == "self":
+                    return keys
+                if node.id in aliases:
+                    return [*aliases[node.id], *keys]
+                return None
+            else:
+                return None
+
+    def __path__(self, cls, owner, keys, seen):
+        if keys == ["super"]:
+            return set()
+        if keys[0] == "super":
+            start = self.mros[cls].index(owner) + 1
+            return self.member(cls, keys[1], seen, start)
+        if keys[0] in ("get", "format"):
+            return set()
+        if keys[0].startswith("__") and keys[0].endswith("__"):
+            return set()
+        if self.__member__(cls, keys[0])[1] is not None:
+            return self.member(cls, keys[0], seen)
+        return {tuple(keys)}
+
+    def member(self, cls, name, seen=None, start=0):
+        seen = set() if seen is None else seen
+        owner, node = self.__member__(cls, name, start)
+        if (node is None) or ((owner, name) in seen):
+            return set()
+        seen.add((owner, name))
+        if name == "plot":
+            paths = set()
+            for path in findall(r"\{0\.([\w.]+)\}", self.__plot__(cls)):
+                paths |= self.__path__(cls, owner, path.split("."), seen)
+            return paths
+        if not isinstance(node, FunctionDef):
+            return set()
+        paths, aliases = set(), {}
+        for item in walk(node):
+            if (
+                isinstance(item, Assign) and len(item.targets) == 1 and
+                isinstance(item.targets[0], Name) and
+                (keys := self.__chain__(item.value, aliases))
+            ):
+                aliases[item.targets[0].id] = keys
+        for item in walk(node):
+            if (
+                isinstance(item, (Attribute, Subscript, Call)) and
+                (keys := self.__chain__(item, aliases))
+            ):
+                if keys[0] == name:
+                    # a property reading the field it is named after
+                    paths.add(tuple(keys))
+                else:
+                    paths |= self.__path__(cls, owner, keys, seen)
+        # only the longest paths matter
+        return {
+            path for path in paths
+            if not any(
+                (other != path) and (other[:len(path)] == path)
+                for other in paths
+            )
+        }
+
+
+__reads__ = Reads()
+
+
+# (query, path to the data in the result, class built from it, members used)
+__views__ = (
+    ("categories", "categories.list", "Category", ("getItem",)),
+    (
+        "search_categories", "search.liveCategories.list", "Category",
+        ("getItem",)
+    ),
+    ("recommended", "globalInfo.recommendChannels.user", "User", ("getItem",)),
+    # the service flattens livestreams to their creator
+    ("search_users", "search.allUsers.list", "User", ("getItem",)),
+    ("search_users", "search.allUsers.list.creator", "User", ("getItem",)),
+    ("streams", "livestreams.list", "StreamRecord", ("getItem",)),
+    ("featured", "carousels.item", "StreamRecord", ("getItem",)),
+    ("user", "user", "User", ("livestream", "pastBroadcasts")),
+    ("user", "user.livestream", "Livestream", ("getItem",)),
+    ("user", "user.pastBroadcasts.list", "PastBroadcastRecord", ("getItem",)),
+    ("vods", "user", "User", ("pastBroadcasts",)),
+    ("vods", "user.pastBroadcasts.list", "PastBroadcastRecord", ("getItem",)),
+    # playback (client.stream) and the watchlist
+    ("live", "user", "User", ("livestream", "displayname")),
+    ("live", "user.livestream", "Livestream", ("makeItem",)),
+    ("live", "user.livestream", "WatchedStreamRecord", ("getItem",))
+)
+
+
+def __reads__of__(cls, members):
+    paths = set()
+    for member in members:
+        if __reads__.__member__(cls, member)[1] is None:
+            # a plain field
+            paths.add((member,))
+        else:
+            paths |= __reads__.member(cls, member)
+    return paths
+
+
+def test_reads():
+    # sanity, the reads are found where they hide
+    assert ("followers", "totalCount") in __reads__of__("User", ("getItem",))
+    stream = __reads__of__("StreamRecord", ("getItem",))
+    assert ("creator", "displayname") in stream
+    assert ("creator", "username") in stream
+    assert ("category", "title") in stream
+    assert ("language", "code") in stream
+    assert ("ageRestriction",) in stream
+    assert ("length",) in __reads__of__("PastBroadcastRecord", ("getItem",))
+
+
+def test_selection():
+    tree = selection("streams")
+    # through fragments
+    assert selected(tree, ["livestreams", "list", "creator", "displayname"])
+    assert not selected(tree, ["livestreams", "list", "creator", "avatar"])
+
+
+@pytest.mark.parametrize(
+    "query, base, cls, members",
+    __views__,
+    ids=[f"{view[0]}:{view[1]}:{view[2]}" for view in __views__]
+)
+def test_selected(query, base, cls, members):
+    tree = selection(query)
+    base = base.split(".")
+    assert selected(tree, base)
+    missing = sorted(
+        ".".join(path) for path in __reads__of__(cls, members)
+        if not selected(tree, [*base, *path])
+    )
+    assert not missing, f"{cls} reads unselected fields from '{query}'"
+
+
+# read outside of objects.py: paging (client), keys (service, index)
+__elsewhere__ = (
+    ("pageInfo", "endCursor"),
+    ("pageInfo", "hasNextPage"),
+    ("category", "backendID"),
+    ("user", "username")
+)
+
+
+def leaves(tree, path=()):
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            yield from leaves(value, (*path, key))
+        else:
+            yield (*path, key)
+
+
+@pytest.mark.parametrize("query", sorted({view[0] for view in __views__}))
+def test_read(query):
+    reads = {
+        (*base.split("."), *path)
+        for _query_, base, cls, members in __views__ if _query_ == query
+        for path in __reads__of__(cls, members)
+    }
+    unread = sorted(
+        ".".join(leaf) for leaf in leaves(selection(query))
+        if not any(leaf[:len(path)] == path for path in reads) and
+        not any(leaf[-len(tail):] == tail for tail in __elsewhere__)
+    )
+    assert not unread, f"'{query}' selects fields nothing reads"